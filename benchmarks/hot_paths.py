@@ -0,0 +1,383 @@
+"""
+Times the hot paths of mpldock with Qt's offscreen platform (no display needed) and compares them with a baseline.
+
+    python benchmarks/hot_paths.py [--repeat N] [--case NAME ...] [--tolerance FRACTION] [--save-baseline]
+
+Every case runs in a fresh interpreter, so the reported peak RSS belongs to that case alone. Cases repeat an operation
+(creating a figure, a wheel gesture, ...) and report per operation:
+
+- the wall time until everything the operations caused is done (renders, layouts and zoom gestures waiting for their
+  timers, render workers); waiting for it polls nothing, so it adds no delay of its own,
+- the same time relative to rendering a reference figure in the same process (`calibrate`), which takes most of the
+  speed of the machine and its momentary load out of the comparison,
+- the CPU time of the process (for reference, it leaves out waiting for timers and for other threads and processes),
+- the number of canvas renders,
+
+and the peak RSS of the process. The fastest of the repeated runs is compared with the baseline. The run fails
+(non-zero exit status) if a case is slower relative to the reference by more than the tolerance, renders more often or
+takes more memory than the baseline allows. Refresh the baseline with `--save-baseline` after an intended change.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+TIME_TOLERANCE = 0.25
+MIN_SLOWDOWN = 0.05  # in renders of the reference figure per operation; smaller differences are noise
+RSS_TOLERANCE = 0.15
+RENDERS_TOLERANCE = 0.2  # frames depend on timing, so the number of renders varies a bit between runs
+SETTLE_TIMEOUT = 30.0
+SETTLE_POLL_MS = 50
+
+_start = (0.0, 0.0)  # wall and CPU time
+_excluded = [0.0, 0.0]  # spent by the benchmark itself (e.g. checking whether events are pending)
+
+
+# Cases. They run in a child process (see `run_case`) and return the number of operations they measured. Setup that is
+# not measured is done before `begin` is called (it also resets render counting); the measurement ends when the case
+# returns.
+
+def case_create_figures(app, n=30):
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    begin()
+    for i in range(n):
+        fig = plt.figure()
+        fig.add_subplot().plot(np.random.rand(1000))
+    settle(app)
+    return n
+
+
+def case_add_dock(app, n=100):
+    from PyQt5.QtWidgets import QLabel
+    from mpldock import add_dock, named, window
+
+    window().show()
+    settle(app)
+    begin()
+    for i in range(n):
+        add_dock(named(QLabel(str(i)), f"label{i}"), dump_state=dict, restore_state=lambda state: None)
+    settle(app)
+    return n
+
+
+def case_scroll_zoom(app, bursts=10, ticks=10):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from matplotlib.backend_bases import MouseEvent
+
+    fig = plt.figure()
+    ax = fig.add_subplot()
+    ax.plot(np.random.rand(20000))
+    widget = fig.canvas.manager.widget
+    settle(app)
+    x, y = ax.bbox.x0 + ax.bbox.width / 3, ax.bbox.y0 + ax.bbox.height / 3
+
+    begin()
+    for burst in range(bursts):
+        button = 'up' if burst % 2 == 0 else 'down'
+        for tick in range(ticks):
+            widget.on_scroll(MouseEvent('scroll_event', fig.canvas, x, y, button=button, step=1))
+            app.processEvents()
+        settle(app)
+    return bursts
+
+
+def case_resize_storm(app, n_figures=6, steps=100):
+    import matplotlib.pyplot as plt
+    import numpy as np
+    from mpldock import window
+
+    for i in range(n_figures):
+        plt.figure().add_subplot().plot(np.random.rand(10000))
+    win = window()
+    win.resize(800, 600)
+    settle(app)
+
+    begin()
+    for step in range(steps):
+        win.resize(800 + step % 20 * 10, 600 + step % 10 * 10)
+        app.processEvents()
+    settle(app)
+    return steps
+
+
+def _large_layout(app, n_figures=40, n_axes=4):
+    import matplotlib.pyplot as plt
+    from mpldock.windows import obtain_state_manager
+
+    for i in range(n_figures):
+        fig = plt.figure()
+        for j in range(n_axes):
+            fig.add_subplot(2, n_axes // 2, j + 1).plot([0, 1], [j, i])
+    settle(app)
+    return obtain_state_manager()
+
+
+def case_state_save(app, state_format='json'):
+    import tempfile
+
+    state_manager = _large_layout(app)
+    path = os.path.join(tempfile.mkdtemp(), f"layout.{state_format}")
+    begin()
+    for i in range(10):
+        state_manager.save_to_file(path)
+    return 10
+
+
+def case_state_restore(app, state_format='json'):
+    import tempfile
+
+    state_manager = _large_layout(app)
+    path = os.path.join(tempfile.mkdtemp(), f"layout.{state_format}")
+    state_manager.save_to_file(path)
+    begin()
+    for i in range(10):
+        state_manager.restore_from_file(path)
+    settle(app)
+    return 10
+
+
+def case_axes_state(app, n_figures=40, n_axes=9):
+    import matplotlib.pyplot as plt
+    from mpldock import axesstate
+
+    figures = []
+    for i in range(n_figures):
+        fig = plt.figure()
+        for j in range(n_axes):
+            fig.add_subplot(3, n_axes // 3, j + 1).plot([1, 2], [j + 1, i + 1])
+        figures.append(fig)
+    settle(app)
+
+    begin()
+    for i in range(10):
+        for fig in figures:
+            states = axesstate.capture(fig.axes)
+            for state in states:
+                state['xlim'] = (0, i + 1)
+                state['ylim'] = (1, 100)
+                state['yscale'] = 'log' if i % 2 else 'linear'
+            axesstate.apply(axesstate.match(fig.axes, states))
+    settle(app)
+    return 10 * n_figures
+
+
+def case_recreate_figures(app, n=60, warmup=20, max_growth=0.05):
+    """
+    Closes and creates figures again and again, as re-running a notebook cell does; the peak RSS must stay flat after a
+    warm-up (figures, canvases and their buffers are freed or reused, not accumulated).
+    """
+    import gc
+    import resource
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    def peak_rss():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    begin()
+    for i in range(n):
+        if i == warmup:
+            gc.collect()
+            warm_rss = peak_rss()
+        plt.close('all')
+        for j in range(3):
+            plt.figure().add_subplot().plot(np.random.rand(10000))
+        settle(app)
+    gc.collect()
+    growth = peak_rss() / warm_rss - 1
+    assert growth <= max_growth, f"peak RSS grew by {growth:.0%} after the warm-up"
+    return n
+
+
+CASES = {
+    'create_figures': case_create_figures,
+    'add_dock': case_add_dock,
+    'scroll_zoom': case_scroll_zoom,
+    'resize_storm': case_resize_storm,
+    'state_save': case_state_save,
+    'state_restore': case_state_restore,
+    'state_restore_indexed': lambda app: case_state_restore(app, 'mpldock'),
+    'axes_state': case_axes_state,
+    'recreate_figures': case_recreate_figures,
+}
+
+
+def _now():
+    return time.perf_counter(), time.process_time()
+
+
+def begin():
+    global _start, _excluded
+    from mpldock import perf
+
+    perf.reset()
+    _excluded = [0.0, 0.0]
+    _start = _now()
+
+
+def _elapsed():
+    return [now - start - excluded for now, start, excluded in zip(_now(), _start, _excluded)]
+
+
+def settle(app):
+    """
+    Processes events until no render, layout or zoom is pending anymore. Between checks it waits for events (e.g. of
+    timers), so it returns as soon as the last of them is handled.
+    """
+    from PyQt5.QtCore import QEvent, QEventLoop, QTimer
+    from mpldock.windows import obtain_frame_scheduler
+
+    scheduler = obtain_frame_scheduler()
+    deadline = time.perf_counter() + SETTLE_TIMEOUT
+    while time.perf_counter() < deadline:
+        app.processEvents()
+        # `deleteLater` is done by the event loop, which isn't running here
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+        checked = _now()
+        # pending renders, layouts and zoom gestures wait for single-shot timers
+        timers = [timer for widget in app.topLevelWidgets() for timer in widget.findChildren(QTimer)]
+        busy = bool(scheduler._dirty) or any(timer.isActive() and timer.isSingleShot() for timer in timers)
+        for i, (now, start) in enumerate(zip(_now(), checked)):
+            _excluded[i] += now - start
+        if not busy:
+            return
+        QTimer.singleShot(SETTLE_POLL_MS, lambda: None)  # wakes the wait up even if a timer is missed
+        app.processEvents(QEventLoop.WaitForMoreEvents)
+
+
+def calibrate(repeat=10) -> float:
+    """
+    Returns the time of rendering a reference figure with Agg (the fastest of `repeat` renders).
+    """
+    import numpy as np
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(6, 4), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.plot(np.sin(np.arange(20000) / 100))
+    ax.grid(True)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        figure.canvas.draw()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_case(name):
+    import resource
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    import matplotlib
+    matplotlib.use('module://mpldock')
+    matplotlib.rcParams['figure.max_open_warning'] = 0
+    from mpldock import perf
+
+    before = calibrate()
+    operations = CASES[name](app)
+    wall, cpu = _elapsed()
+    # a single calibration may be slowed down by other processes
+    reference = min(before, calibrate())
+    renders = sum(s['count'] for operations_stats in perf.stats().values()
+                  for operation, s in operations_stats.items() if operation.startswith('draw'))
+    # kilobytes on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return dict(operations=operations, time=wall / operations, relative=wall / reference / operations,
+                cpu=cpu / operations, renders=renders / operations, rss=rss)
+
+
+def measure(name):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])),
+               QT_QPA_PLATFORM='offscreen', MPLBACKEND='module://mpldock')
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-case', name], env=env, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(name, result, baseline, tolerance):
+    """
+    Returns descriptions of regressions of `result` with respect to `baseline`.
+    """
+    if baseline is None or 'cpu' not in baseline:
+        return []  # no baseline, or one of an old format
+    regressions = []
+    if result['relative'] > max(baseline['relative'] * (1 + tolerance), baseline['relative'] + MIN_SLOWDOWN):
+        regressions.append(f"{name}: {result['relative']:.2f} > {baseline['relative']:.2f} reference renders per "
+                           f"operation ({result['time'] * 1000:.2f} ms)")
+    # one render more than the baseline is timing, not a regression
+    allowed_renders = baseline['renders'] * (1 + RENDERS_TOLERANCE) + 1 / result['operations']
+    if result['renders'] > allowed_renders:
+        regressions.append(f"{name}: {result['renders']:.3f} > {baseline['renders']:.3f} renders per operation")
+    if result['rss'] > baseline['rss'] * (1 + RSS_TOLERANCE):
+        regressions.append(f"{name}: peak RSS {result['rss'] / 2 ** 20:.1f} MB > {baseline['rss'] / 2 ** 20:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--case', action='append', choices=sorted(CASES), help="run only this case (repeatable)")
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE, help="allowed slowdown (a fraction)")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case)))
+        return 0
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'case':24} {'ops':>5} {'ms/op':>8} {'ref/op':>8} {'cpu ms/op':>10} {'renders/op':>11} "
+          f"{'peak RSS [MB]':>14} {'baseline ref/op':>16}")
+    for name in args.case or CASES:
+        runs = [measure(name) for _ in range(args.repeat)]
+        # the fastest run is the least disturbed by other processes
+        result = results[name] = dict(
+            operations=runs[0]['operations'],
+            time=min(r['time'] for r in runs),
+            relative=min(r['relative'] for r in runs),
+            cpu=min(r['cpu'] for r in runs),
+            renders=statistics.median(r['renders'] for r in runs),
+            rss=max(r['rss'] for r in runs),
+        )
+        baseline = baselines.get(name)
+        baseline_relative = f"{baseline['relative']:16.2f}" if baseline and 'cpu' in baseline else f"{'-':>16}"
+        print(f"{name:24} {result['operations']:5d} {result['time'] * 1000:8.2f} {result['relative']:8.2f} "
+              f"{result['cpu'] * 1000:10.2f} {result['renders']:11.3f} {result['rss'] / 2 ** 20:14.1f} "
+              f"{baseline_relative}")
+        regressions += compare(name, result, baseline, args.tolerance)
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    for regression in regressions:
+        print(f"FAIL: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Measures how long `import mpldock` takes in a fresh interpreter and checks that it does not load Qt, the matplotlib Qt
+backend or other heavy modules (they should be loaded only when a window or a canvas is needed).
+
+    python benchmarks/import_time.py [--repeat N] [--budget SECONDS]
+
+Exits with a non-zero status if a heavy module is imported or the median time exceeds the budget.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORBIDDEN_MODULES = [
+    'PyQt5.QtCore',
+    'PyQt5.QtWidgets',
+    'matplotlib',
+    'matplotlib.backends.backend_qt5agg',
+    'numpy',
+    'appdirs',
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps(dict(elapsed=elapsed, modules=sorted(sys.modules))))
+"""
+
+
+def measure(module='mpldock'):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], env=env, check=True,
+                            stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.15, help="maximal median import time in seconds")
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.repeat)]
+    median = statistics.median(r['elapsed'] for r in results)
+    loaded = [m for m in FORBIDDEN_MODULES if m in results[0]['modules']]
+    full = statistics.median(measure('mpldock.backend')['elapsed'] for _ in range(args.repeat))
+
+    print(f"import mpldock:         {median * 1000:8.1f} ms (budget {args.budget * 1000:.0f} ms)")
+    print(f"import mpldock.backend: {full * 1000:8.1f} ms (for reference)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: heavy modules imported eagerly: {', '.join(loaded)}")
+        failed = True
+    if median > args.budget:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
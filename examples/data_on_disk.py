@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+from mpldock import persist_layout, plot_source
+
+matplotlib.use('module://mpldock')
+persist_layout('6f0c3f58-5d0e-4b8a-9c7e-2d1f4a8b3e61')
+
+# a recording of 200 million samples (800 MB), created once
+path = os.path.join(tempfile.gettempdir(), 'mpldock_recording.f32')
+n = 200_000_000
+if not os.path.exists(path):
+    recording = np.memmap(path, dtype=np.float32, mode='w+', shape=(n,))
+    for start in range(0, n, 10_000_000):
+        t = np.arange(start, start + 10_000_000)
+        recording[start:start + 10_000_000] = np.sin(t / 1e6) + np.random.normal(0, 0.1, len(t))
+    recording.flush()
+    del recording
+
+samples = np.memmap(path, dtype=np.float32, mode='r')
+plot_source(plt.figure("recording").gca(), samples, dx=1 / 48000)
+
+plt.show()
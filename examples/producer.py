@@ -0,0 +1,33 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+
+from mpldock import persist_layout, start_producer
+
+matplotlib.use('module://mpldock')
+
+
+def simulate(publish, steps):
+    # runs in a worker process, so it doesn't block the GUI however heavy it is
+    field = np.random.rand(512, 512)
+    for i in range(steps):
+        for _ in range(20):
+            field = (field + np.roll(field, 1, 0) + np.roll(field, -1, 0) + np.roll(field, 1, 1)
+                     + np.roll(field, -1, 1)) / 5
+        publish('field', field)
+        publish('profile', field[256])
+
+
+if __name__ == '__main__':
+    persist_layout('5b0c6f0e-6a9e-4d4c-9a59-2f1b8f7a3c11')
+
+    plt.figure("field")
+    image = plt.imshow(np.zeros((512, 512)), vmin=0.4, vmax=0.6)
+    plt.figure("profile")
+    line, = plt.plot(np.zeros(512))
+
+    producer = start_producer(simulate, 1000)
+    producer.bind('field', image)
+    producer.bind('profile', line)
+
+    plt.show()
@@ -0,0 +1,28 @@
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+from PyQt5.QtCore import QTimer
+
+from mpldock import persist_layout, streaming_line
+
+matplotlib.use('module://mpldock')
+persist_layout('1e2682b5-4408-42a6-ae97-5a7e9b3c0d21')
+
+signal = streaming_line("live signal", capacity=10000, x_window=2000)
+noise = streaming_line("live noise", capacity=100000)
+
+
+def produce():
+    # a producer may push samples much more often than the figures are refreshed
+    t = np.arange(produce.t, produce.t + 50)
+    produce.t += 50
+    signal.append(np.sin(t / 100) + np.random.normal(0, 0.05, len(t)))
+    noise.append(np.random.normal(0, 1, len(t)))
+
+
+produce.t = 0
+timer = QTimer()
+timer.timeout.connect(produce)
+timer.start(5)
+
+plt.show()
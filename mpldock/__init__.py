@@ -1,7 +1,53 @@
-from .windows import add_dock, window, run, persist_layout
+import importlib
+import sys
+import types
+
+from .windows import add_dock, add_lazy_dock, window, run, persist_layout, obtain_frame_scheduler
 from mpldock.common import named
-from . import tweaks, backend
+from .buffers import buffer_usage, set_memory_budget
+from .links import link_axes
+from . import perf, tweaks
+
+__all__ = ["window", "add_dock", "add_lazy_dock", "tweaks", "perf", "backend", "run", "persist_layout",
+           "obtain_frame_scheduler", "buffer_usage", "set_memory_budget", "link_axes", "StreamingLine",
+           "streaming_line", "enable_lod", "pyramid_imshow", "plot_source", "DataSource", "start_producer", "aio"]
+
+# These pull in Qt and the matplotlib Qt backend, so they are imported on first use (see `__getattr__`).
+_lazy_attributes = dict(
+    backend=('.backend', None),
+    aio=('.aio', None),
+    FigureCanvas=('.backend', 'FigureCanvas'),
+    StreamingLine=('.streaming', 'StreamingLine'),
+    streaming_line=('.streaming', 'streaming_line'),
+    enable_lod=('.lod', 'enable_lod'),
+    pyramid_imshow=('.pyramid', 'pyramid_imshow'),
+    plot_source=('.datasource', 'plot_source'),
+    DataSource=('.datasource', 'DataSource'),
+    start_producer=('.producers', 'start_producer'),
+)
+
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    module = importlib.import_module(module_name, __name__)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_attributes))
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # the `mpldock.window` submodule is imported lazily and importing it would shadow the `window` function
+        if name == 'window' and isinstance(value, types.ModuleType):
+            return
+        super().__setattr__(name, value)
 
-__all__ = ["window", "add_dock", "tweaks", "backend", "run", "persist_layout"]
 
-FigureCanvas = backend.FigureCanvas
+sys.modules[__name__].__class__ = _Package
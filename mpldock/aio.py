@@ -0,0 +1,244 @@
+"""
+Asyncio integration: an asyncio event loop driven by the Qt event loop, so coroutines can update docks while the window
+is running (`Window.run(main)`, `mpldock.run(main)` or `spawn(coroutine)` in IPython with `%gui qt`).
+
+The loop is stepped whenever its selector becomes readable (I/O, `call_soon_threadsafe`) or its nearest timer expires,
+so nothing is polled. When the loop is run by someone else (e.g. IPython awaiting a cell), Qt events are processed from
+within the loop instead.
+
+The loop is created by `loop_factory` (like `asyncio.Runner`, which owns it on Python >= 3.11) and closed when the
+application quits; if a loop is already running when it's first needed, that one is driven instead.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, pyqtBoundSignal
+from PyQt5.QtWidgets import QApplication, QWidget
+
+QT_PUMP_INTERVAL = 0.01  # seconds; how often Qt events are processed while the loop is run by someone else
+FALLBACK_POLL_MS = 10  # for loops without a pollable selector (e.g. the proactor loop on Windows)
+
+# creates the loop driven by Qt (`asyncio.new_event_loop` if None), e.g. `uvloop.new_event_loop`; set it before the loop
+# is first used
+loop_factory = None  # type: Optional[Callable[[], asyncio.AbstractEventLoop]]
+
+
+class QtAsyncioBridge(QObject):
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        super().__init__()
+        self.loop = loop
+        self._stepping = False
+        self._pump_handle = None
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.step)
+
+        selector = getattr(loop, '_selector', None)
+        self._notifier = None
+        if selector is not None and hasattr(selector, 'fileno'):
+            self._notifier = QSocketNotifier(selector.fileno(), QSocketNotifier.Read, self)
+            self._notifier.activated.connect(self.step)
+
+        # `run_until_complete` and others run `run_forever`; when it's not our step, Qt has to be kept alive from within
+        run_forever = loop.run_forever
+
+        def run_forever_with_qt():
+            if not self._stepping and self._pump_handle is None:
+                self._pump_handle = loop.call_soon(self._pump_qt)
+            return run_forever()
+
+        loop.run_forever = run_forever_with_qt
+        self.wake()
+
+    def detach(self):
+        """
+        Stops driving the loop (it may be run normally afterwards, e.g. to be closed).
+        """
+        self._timer.stop()
+        if self._notifier is not None:
+            self._notifier.setEnabled(False)
+        if self._pump_handle is not None:
+            self._pump_handle.cancel()
+            self._pump_handle = None
+        self.loop.__dict__.pop('run_forever', None)
+
+    def wake(self):
+        """
+        Makes the loop run its ready callbacks soon (needed after `call_soon` from outside of the loop, e.g. in a slot).
+        """
+        self._timer.start(0)
+
+    def step(self, *args):
+        if self.loop.is_closed() or self._stepping:
+            return
+        if self.loop.is_running():
+            return  # run by someone else (e.g. `run_until_complete`), which processes Qt events (see `_pump_qt`)
+        self._stepping = True
+        try:
+            # runs the callbacks that are ready and handles I/O without blocking (the `stop` callback is ready)
+            self.loop.call_soon(self.loop.stop)
+            self.loop.run_forever()
+        finally:
+            self._stepping = False
+        self._schedule()
+
+    def _schedule(self):
+        # private, but stable parts of `BaseEventLoop`; it has no public way to tell when it needs to run next
+        ready = getattr(self.loop, '_ready', None)
+        scheduled = getattr(self.loop, '_scheduled', None)
+        if ready is None or scheduled is None:
+            self._timer.start(FALLBACK_POLL_MS)
+        elif ready:
+            self._timer.start(0)
+        elif scheduled:
+            self._timer.start(max(int((scheduled[0].when() - self.loop.time()) * 1000) + 1, 0))
+        elif self._notifier is None:
+            self._timer.start(FALLBACK_POLL_MS)
+        else:
+            self._timer.stop()
+
+    def _pump_qt(self):
+        self._pump_handle = None
+        if self._stepping or not self.loop.is_running():
+            return
+        QApplication.processEvents()
+        self._pump_handle = self.loop.call_later(QT_PUMP_INTERVAL, self._pump_qt)
+
+
+_bridge = None  # type: Optional[QtAsyncioBridge]
+# closes the loop if it was created here
+_close_loop = None  # type: Optional[Callable[[], None]]
+
+
+def _new_loop() -> asyncio.AbstractEventLoop:
+    global _close_loop
+    try:
+        # e.g. a coroutine run by IPython's autoawait; its loop is not ours to close
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    if hasattr(asyncio, 'Runner'):  # Python >= 3.11
+        runner = asyncio.Runner(loop_factory=loop_factory)
+        loop = runner.get_loop()
+        _close_loop = runner.close
+    else:
+        loop = (loop_factory or asyncio.new_event_loop)()
+        if loop_factory is None:
+            asyncio.set_event_loop(loop)  # as `asyncio.Runner` does
+
+        def close_loop():
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            if loop_factory is None:
+                asyncio.set_event_loop(None)
+
+        _close_loop = close_loop
+    app = QApplication.instance()
+    if app is not None:
+        app.aboutToQuit.connect(close)
+    return loop
+
+
+def close():
+    """
+    Closes the loop driven by Qt if it was created here, cancelling its remaining tasks (done when the application
+    quits). A new loop is created when it's needed again.
+    """
+    global _bridge, _close_loop
+    if _bridge is None or _bridge.loop.is_running():
+        return
+    close_loop = _close_loop
+    _bridge.detach()
+    _bridge = _close_loop = None
+    if close_loop is None:
+        return
+    app = QApplication.instance()
+    if app is not None:
+        try:
+            app.aboutToQuit.disconnect(close)
+        except TypeError:
+            pass  # the loop was created before the application
+    try:
+        close_loop()
+    except Exception:
+        logging.exception("exception during closing the asyncio loop")
+
+
+def obtain_bridge() -> QtAsyncioBridge:
+    global _bridge
+    if _bridge is None or _bridge.loop.is_closed():
+        _bridge = QtAsyncioBridge(_new_loop())
+    return _bridge
+
+
+def obtain_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the asyncio event loop driven by Qt.
+    """
+    return obtain_bridge().loop
+
+
+def _log_exception(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("exception in a coroutine", exc_info=task.exception())
+
+
+def spawn(coroutine: Awaitable) -> asyncio.Future:
+    """
+    Runs a coroutine in the loop driven by Qt and returns its task. Exceptions are logged.
+    """
+    bridge = obtain_bridge()
+    task = asyncio.ensure_future(coroutine, loop=bridge.loop)
+    task.add_done_callback(_log_exception)
+    bridge.wake()
+    return task
+
+
+def _resolve(future: asyncio.Future, result=None):
+    if not future.done():
+        future.set_result(result)
+        obtain_bridge().wake()  # resolved from a slot, outside of the loop
+
+
+def wait_for_signal(signal: pyqtBoundSignal) -> asyncio.Future:
+    """
+    Returns a future resolved with the arguments of the next emission of a Qt signal (e.g. `producer.finished`).
+    """
+    future = obtain_loop().create_future()
+
+    def emitted(*args):
+        signal.disconnect(emitted)
+        _resolve(future, args[0] if len(args) == 1 else args)
+
+    signal.connect(emitted)
+    return future
+
+
+def next_frame(canvas: QWidget = None) -> asyncio.Future:
+    """
+    Returns a future resolved when the next frame is rendered (by the frame scheduler, see `obtain_frame_scheduler`).
+
+    Awaiting it after updating figures makes a coroutine produce data no faster than it is shown.
+    :param canvas: Wait until this canvas is rendered (resolves immediately if it's not waiting for a render).
+    """
+    from .windows import obtain_frame_scheduler
+
+    scheduler = obtain_frame_scheduler()
+    future = obtain_loop().create_future()
+    if not scheduler.has_pending() or (canvas is not None and not scheduler.is_pending(canvas)):
+        future.set_result(None)
+        return future
+
+    def frame_rendered():
+        if canvas is None or not scheduler.is_pending(canvas):
+            scheduler.frame_rendered.disconnect(frame_rendered)
+            _resolve(future)
+
+    scheduler.frame_rendered.connect(frame_rendered)
+    return future
@@ -0,0 +1,165 @@
+"""
+Capturing and applying the view state of axes (limits, scales, grids and links) saved with the layout.
+
+Capturing reads the grid state from the settings ticks are created with, so tick objects are not instantiated (or
+even looked at) just to be asked whether their gridline is visible. Applying sets all properties of many axes at once
+with their callbacks blocked; `xlim_changed`/`ylim_changed` are then emitted once per changed axes.
+
+States are matched to axes by a key stable between sessions (the label or the place in the subplot grid) rather than by
+the order of axes in the figure; states saved without a key are matched by index.
+"""
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Dict, Iterable, List, Sequence, Tuple
+
+from matplotlib.axis import Axis
+
+from . import links
+from .common import DumpedState
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
+
+def _ticks_instantiated(axis: Axis, major: bool) -> bool:
+    # `majorTicks` and `minorTicks` are lazy descriptors replaced by a list in the instance on the first access
+    return ('majorTicks' if major else 'minorTicks') in vars(axis)
+
+
+def _grid_on(axis: Axis, major: bool) -> bool:
+    tick_kw = getattr(axis, '_major_tick_kw' if major else '_minor_tick_kw', None)
+    if tick_kw is not None and 'gridOn' in tick_kw:
+        return bool(tick_kw['gridOn'])  # kept up to date by `Axis.grid`
+    ticks = axis.majorTicks if major else axis.minorTicks  # older matplotlib
+    return bool(ticks) and ticks[0].gridline.get_visible()
+
+
+def _set_grid_on(axis: Axis, major: bool, on: bool):
+    if _grid_on(axis, major) == on:
+        return
+    tick_kw = getattr(axis, '_major_tick_kw' if major else '_minor_tick_kw', None)
+    if tick_kw is not None and not _ticks_instantiated(axis, major):
+        tick_kw['gridOn'] = on  # ticks will be created with it
+        axis.stale = True
+    else:
+        axis.grid(on, which='major' if major else 'minor')
+
+
+def capture_axis(axis: Axis) -> DumpedState:
+    major = _grid_on(axis, True)
+    minor = _grid_on(axis, False)
+    if major or minor:
+        return dict(grid=dict(which='both' if major and minor else 'major' if major else 'minor'))
+    return dict(grid=None)
+
+
+def capture_axes(axes: 'Axes') -> DumpedState:
+    group = links.group_of(axes)
+    return dict(
+        xlim=axes.get_xlim(),
+        ylim=axes.get_ylim(),
+        xscale=axes.get_xscale(),
+        yscale=axes.get_yscale(),
+        x_axis=capture_axis(axes.get_xaxis()),
+        y_axis=capture_axis(axes.get_yaxis()),
+        link=group.dump_membership() if group is not None else None,
+    )
+
+
+def _base_key(axes: 'Axes') -> str:
+    label = axes.get_label()
+    if label and not label.startswith('<'):  # e.g. '<colorbar>' is not chosen by the user
+        return f"label:{label}"
+    get_subplotspec = getattr(axes, 'get_subplotspec', None)
+    spec = get_subplotspec() if get_subplotspec is not None else None
+    if spec is not None:
+        rows, cols, start, stop = spec.get_geometry()
+        return f"subplot:{rows}x{cols}:{start}-{stop}"
+    x, y, width, height = axes.get_position(original=True).bounds
+    return f"rect:{x:.4g},{y:.4g},{width:.4g},{height:.4g}"
+
+
+def axes_keys(axes_list: Sequence['Axes']) -> List[str]:
+    """
+    Returns keys identifying axes of a figure between sessions. Axes with the same label or place (e.g. twin axes) are
+    told apart by their order.
+    """
+    counts = {}  # type: Dict[str, int]
+    keys = []
+    for axes in axes_list:
+        key = _base_key(axes)
+        count = counts.get(key, 0)
+        counts[key] = count + 1
+        keys.append(key if count == 0 else f"{key}#{count}")
+    return keys
+
+
+def capture(axes_list: Sequence['Axes']) -> List[DumpedState]:
+    """
+    Captures the state of all axes of a figure (in the order of `axes_list`, keyed by `axes_keys`).
+    """
+    return [dict(capture_axes(axes), key=key) for axes, key in zip(axes_list, axes_keys(axes_list))]
+
+
+def match(axes_list: Sequence['Axes'], states: Sequence[DumpedState]) -> List[Tuple['Axes', DumpedState]]:
+    """
+    Pairs axes with their saved states: by key, or by index for states saved without one.
+    """
+    if not states:
+        return []
+    by_key = {state['key']: state for state in states if 'key' in state}
+    pairs = []
+    for i, (axes, key) in enumerate(zip(axes_list, axes_keys(axes_list))):
+        state = by_key.get(key)
+        if state is None and i < len(states) and 'key' not in states[i]:
+            state = states[i]
+        if state is not None:
+            pairs.append((axes, state))
+    return pairs
+
+
+def apply_axis(axis: Axis, state: DumpedState):
+    if 'grid' not in state:
+        return
+    which = state['grid']['which'] if state['grid'] else None
+    _set_grid_on(axis, True, which in ('major', 'both'))
+    _set_grid_on(axis, False, which in ('minor', 'both'))
+
+
+def apply(pairs: Iterable[Tuple['Axes', DumpedState]]):
+    """
+    Applies states to axes with callbacks of the axes blocked until all of them are applied.
+    """
+    pairs = list(pairs)
+    changed = []  # type: List[Tuple[Axes, str]]
+    with ExitStack() as stack:
+        for axes, _ in pairs:
+            stack.enter_context(axes.callbacks.blocked())
+        for axes, state in pairs:
+            # the scale goes first: limits are valid in it and setting it later would autoscale
+            if 'xscale' in state and axes.get_xscale() != state['xscale']:
+                axes.set_xscale(state['xscale'])
+            if 'yscale' in state and axes.get_yscale() != state['yscale']:
+                axes.set_yscale(state['yscale'])
+            if 'xlim' in state and axes.get_xlim() != tuple(state['xlim']):
+                axes.set_xlim(state['xlim'], auto=False)
+                changed.append((axes, 'xlim_changed'))
+            if 'ylim' in state and axes.get_ylim() != tuple(state['ylim']):
+                axes.set_ylim(state['ylim'], auto=False)
+                changed.append((axes, 'ylim_changed'))
+            if 'x_axis' in state:
+                apply_axis(axes.get_xaxis(), state['x_axis'])
+            if 'y_axis' in state:
+                apply_axis(axes.get_yaxis(), state['y_axis'])
+
+    for axes, signal in changed:
+        axes.callbacks.process(signal, axes)
+
+    # links adopt limits of their groups, so they are joined once all limits are in place
+    for axes, state in pairs:
+        link = state.get('link')
+        if link:
+            links.obtain_link_group(link['group'], link['x'], link['y']).add(axes)
+
+
+def apply_axes(axes: 'Axes', state: DumpedState):
+    apply([(axes, state)])
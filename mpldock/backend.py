@@ -1,25 +1,77 @@
 import logging
+import time
+from concurrent.futures import Future
 
-from matplotlib.backend_bases import FigureManagerBase
+import numpy as np
+from PyQt5.QtCore import QRectF, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+from matplotlib._pylab_helpers import Gcf
+from matplotlib.backend_bases import FigureCanvasBase, FigureManagerBase, MouseEvent
+from matplotlib.backends.backend_agg import RendererAgg
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
-from mpldock import add_dock, window
+from mpldock import add_dock, perf, window
+from mpldock.windows import obtain_frame_scheduler
+from mpldock.buffers import obtain_buffer_budget
 from mpldock.figure import MplFigure
+from mpldock.rendering import RenderWorker, obtain_executor, render_snapshot, snapshot
+
+
+def set_render_worker(worker: RenderWorker, existing=True):
+    """
+    Sets where canvases render their figures (see `FigureCanvas.set_render_worker`).
+    :param worker: 'thread', 'process', an executor or `None` for the GUI thread.
+    :param existing: Apply also to already existing canvases (otherwise only to those created later).
+    """
+    FigureCanvas.default_render_worker = worker
+    if existing:
+        for manager in Gcf.get_all_fig_managers():
+            if isinstance(manager.canvas, FigureCanvas):
+                manager.canvas.set_render_worker(worker)
 
 
 class FigureManagerQTDock(FigureManagerBase):
-    def __init__(self, canvas: FigureCanvasQTAgg, num):
-        self.widget = MplFigure(canvas)
+    def __init__(self, canvas: FigureCanvasQTAgg, num, widget: MplFigure = None):
+        """
+        :param widget: A docked widget already showing the figure in `canvas` (see `FigureCanvas.new_manager`).
+        """
         self.name = f"MplFigure__{num}"
-        self.widget.setObjectName(self.name)
         self.window = window()
+        reused = widget is not None
+        self.widget = widget if reused else MplFigure(canvas)
+        self.widget.setObjectName(self.name)
+        self._widget_destroyed = False
         super().__init__(canvas=canvas, num=num)
-        add_dock(self.widget, dump_state=self.widget.dump_state, restore_state=self.widget.restore_state)
+        if not reused:
+            add_dock(self.widget, dump_state=self.widget.dump_state, restore_state=self.widget.restore_state)
+            self.widget.track_dock_visibility()
+        # a removed dock closes the figure
+        self.widget.destroyed.connect(self._on_widget_destroyed)
 
     def destroy(self, *args):
-        # Not sure what should we do here
-        pass
+        if self._widget_destroyed:
+            return  # nothing to keep (and its children are already deleted)
+        # the figure is closed; its dock stays (showing the last frame) for a figure created again with the same number,
+        # which reuses the canvas and takes over the view
+        widget_instance = self.window.widgets.get(self.name)
+        if widget_instance is not None and widget_instance.widget is self.widget:
+            self.widget.park()
+
+    def hand_over(self):
+        """
+        Stops following the widget, which is taken over by the manager of a figure created again with the same number.
+        """
+        self.widget.destroyed.disconnect(self._on_widget_destroyed)
+
+    def _on_widget_destroyed(self):
+        self._widget_destroyed = True
+        if Gcf.figs.get(self.num) is self:
+            Gcf.destroy(self)
+
+    @property
+    def skipped_renders(self):
+        return self.canvas.skipped_renders
 
     def get_window_title(self):
         return self.widget.windowTitle()
@@ -38,18 +90,304 @@ class FigureManagerQTDock(FigureManagerBase):
 
 # This class is an entry point to the backend. It's methods are called by matplotlib if the current module is used as a backend.
 class FigureCanvas(FigureCanvasQTAgg):
-    required_interactive_framework = "qt5"
     FigureCanvas = FigureCanvasQTAgg
     FigureManager = FigureManagerQTDock
 
+    # render worker used by canvases created from now on, see `set_render_worker`
+    default_render_worker = None  # type: RenderWorker
+
+    # During interaction (dragging with the mouse, wheel zoom, resizing) figures are rendered at
+    # `interactive_pixel_ratio` instead of the device pixel ratio of a HiDPI screen and upscaled. They are rendered at
+    # full resolution after `interactive_idle_ms` without interaction. Screens whose pixel ratio is not above that are
+    # not affected.
+    interactive_quality = True
+    interactive_pixel_ratio = 1.0
+    interactive_idle_ms = 250
+
+    # While the canvas is being resized (e.g. a splitter between docks is dragged) the last frame is shown scaled and
+    # nothing is rendered; the figure is laid out and rendered once the drag ends or after `resize_settle_ms` without
+    # another resize.
+    resize_preview = True
+    resize_settle_ms = 150
+
+    frame_rendered = pyqtSignal(Future)
+    resize_finished = pyqtSignal()  # emitted before the figure is rendered at its final size
+
     def __init__(self, figure: Figure):
         super().__init__(figure)
         self.figure = figure
+        self.dock_visible = True
+        self.stale_while_hidden = False
+        self.skipped_renders = 0  # number of renders that were not done because the dock was hidden
+        self._skip_pending = False
+
+        self.render_executor = None
+        self._render_future = None
+        self._render_started = 0.0
+        self._render_requested = False
+        self._async_frame = None  # the last frame rendered by the worker
+        self.frame_rendered.connect(self._on_frame_rendered)
+        self.set_render_worker(self.default_render_worker)
+
+        self._preview_frame = None  # a reduced resolution frame rendered during interaction
+        self._interaction_timer = QTimer(self)
+        self._interaction_timer.setSingleShot(True)
+        self._interaction_timer.timeout.connect(self._end_interaction)
+        self.mpl_connect('motion_notify_event', self._on_motion)
+
+        self._resize_frame = None  # the frame shown scaled while resizing
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.timeout.connect(self.finish_resize)
+
+    def set_dock_visible(self, visible: bool):
+        self.dock_visible = visible
+        scheduler = obtain_frame_scheduler()
+        if not visible and scheduler.is_pending(self):
+            scheduler.cancel(self)
+            self.stale_while_hidden = True
+        if visible:
+            obtain_buffer_budget().touch(self)
+        else:
+            # buffers of a hidden canvas may be dropped now
+            obtain_buffer_budget().enforce()
+        if visible and self.stale_while_hidden:
+            self.stale_while_hidden = False
+            self.draw_idle()
+
+    def set_figure(self, figure: Figure):
+        """
+        Shows another figure in this canvas. The pixel buffer is reused if the size and dpi stay the same (until then
+        the last frame is shown). The previous figure gets a canvas of its own, so it can be freed or saved separately.
+        """
+        obtain_frame_scheduler().cancel(self)
+        self._render_requested = False
+        self._preview_frame = None
+        old = self.figure
+        if old is not None and old.canvas is self:
+            FigureCanvasBase(old)
+        figure.set_canvas(self)
+        self.figure = figure
+        self._button = self._key = self.mouse_grabber = None
+        self._blit_backgrounds = {}
+        # what `FigureCanvasBase.__init__` and `resizeEvent` would do for the figure
+        figure._original_dpi = getattr(figure, '_original_dpi', figure.dpi)
+        figure._set_dpi(self.device_pixel_ratio * figure._original_dpi, forward=False)
+        figure.set_size_inches(self.width() * self.device_pixel_ratio / figure.dpi,
+                               self.height() * self.device_pixel_ratio / figure.dpi, forward=False)
+        self.mpl_connect('motion_notify_event', self._on_motion)
+
+    def release(self):
+        """
+        Tears the canvas down before it is deleted: pending renders are dropped, the buffers freed and the figure gets a
+        canvas of its own.
+        """
+        obtain_frame_scheduler().cancel(self)
+        obtain_buffer_budget().forget(self)
+        self._interaction_timer.stop()
+        self._resize_timer.stop()
+        self._render_requested = False
+        self.drop_buffers()
+        self.stale_while_hidden = False
+        if self.figure is not None and self.figure.canvas is self:
+            FigureCanvasBase(self.figure)
+
+    def drop_buffers(self):
+        """
+        Frees the pixel buffers; the figure is rendered again when the dock is shown (see `mpldock.buffers`).
+        """
+        self.__dict__.pop('renderer', None)
+        self._lastKey = None
+        self._async_frame = None
+        self._preview_frame = None
+        self._resize_frame = None
+        self.stale_while_hidden = True
+
+    def begin_interaction(self):
+        """
+        Tells that the user is interacting with the figure, so it may be rendered at a reduced resolution for a while
+        (see `interactive_quality`).
+        """
+        if self.interactive_quality:
+            self._interaction_timer.start(self.interactive_idle_ms)
+
+    @property
+    def interacting(self) -> bool:
+        return self._interaction_timer.isActive()
+
+    def _end_interaction(self):
+        if self._preview_frame is not None:
+            self.draw_idle()  # at full resolution now
+
+    def _on_motion(self, event: MouseEvent):
+        if event.button is not None:
+            self.begin_interaction()  # dragging (e.g. panning)
+
+    @property
+    def resizing(self) -> bool:
+        return self._resize_frame is not None
+
+    def resizeEvent(self, event):
+        if self.resize_preview and self.dock_visible and not self.resizing:
+            self._resize_frame = self._last_frame()  # the first layout is rendered normally
+        if self.resizing:
+            self._resize_timer.start(self.resize_settle_ms)
+        elif hasattr(self, 'renderer'):
+            self.begin_interaction()  # e.g. a splitter is dragged
+        super().resizeEvent(event)
+
+    def _last_frame(self):
+        if self._preview_frame is not None:
+            return self._preview_frame
+        if self._async_frame is not None:
+            return self._async_frame
+        renderer = self.__dict__.get('renderer')
+        # a view keeps the buffer alive even if the renderer is replaced
+        return np.asarray(renderer.buffer_rgba()) if renderer is not None else None
+
+    def finish_resize(self):
+        """
+        Ends the resize preview (see `resize_preview`): the figure is rendered at its current size.
+        """
+        if not self.resizing:
+            return
+        self._resize_timer.stop()
+        self._resize_frame = None
+        self.resize_finished.emit()
+        self.draw_idle()
+
+    def draw_idle(self):
+        if self.resizing:
+            self.update()  # the preview is repainted; the render waits for `finish_resize`
+            return
+        if self.dock_visible:
+            # rendered in the next frame together with other figures
+            obtain_frame_scheduler().request(self)
+            return
+        # nobody would see the frame; render it once the dock is shown
+        self.stale_while_hidden = True
+        if not self._skip_pending:
+            # count requests the same way draw_idle merges them (all requests within one event loop iteration)
+            self._skip_pending = True
+            self.skipped_renders += 1
+            QTimer.singleShot(0, self._reset_skip_pending)
+
+    def _reset_skip_pending(self):
+        self._skip_pending = False
+
+    def set_render_worker(self, worker: RenderWorker):
+        """
+        Moves rendering off the GUI thread: 'thread' or 'process' (shared pools), any `concurrent.futures.Executor` or
+        `None` to render on the GUI thread again.
+
+        A snapshot (pickle) of the figure is rendered by the worker while the canvas keeps showing the last frame.
+        Requests made while a render is in flight are merged into one that is started after it. Note that in this mode
+        `draw` returns before the frame is ready, so code relying on the renderer (e.g. `copy_from_bbox`) won't work.
+        """
+        self.render_executor = obtain_executor(worker)
+        if self.render_executor is None:
+            self._async_frame = None
+
+    def draw(self):
+        if self.render_executor is None:
+            if self.interacting and self.device_pixel_ratio > self.interactive_pixel_ratio:
+                with perf.measure('draw (interactive)', perf.widget_name(self)):
+                    self._draw_preview()
+                return
+            with perf.measure('draw', perf.widget_name(self)):
+                super().draw()
+            self._preview_frame = None
+            obtain_buffer_budget().touch(self)
+            return
+        self._render_requested = True
+        self._submit_render()
+
+    def _draw_preview(self):
+        # the figure is drawn at a lower dpi into a separate renderer, so the full resolution buffer stays intact
+        dpi = self.figure.dpi
+        self.figure._set_dpi(dpi * self.interactive_pixel_ratio / self.device_pixel_ratio, forward=False)
+        try:
+            width, height = self.figure.bbox.size
+            renderer = RendererAgg(max(int(width), 1), max(int(height), 1), self.figure.dpi)
+            self.figure.draw(renderer)
+            self._preview_frame = np.array(renderer.buffer_rgba())
+        finally:
+            self.figure._set_dpi(dpi, forward=False)
+        self.update()
+
+    def _submit_render(self):
+        if self._render_future is not None or not self._render_requested:
+            return
+        self._render_requested = False
+        try:
+            figure_snapshot = snapshot(self.figure)
+        except Exception:
+            logging.exception("cannot take a snapshot of the figure; rendering on the GUI thread")
+            super().draw()
+            return
+        self._render_started = time.perf_counter()
+        self._render_future = self.render_executor.submit(render_snapshot, figure_snapshot, self.figure.dpi)
+        # the signal brings the result back to the GUI thread
+        self._render_future.add_done_callback(self.frame_rendered.emit)
+
+    def _on_frame_rendered(self, future: Future):
+        self._render_future = None
+        try:
+            self._async_frame = future.result()
+            if perf.enabled:
+                # from the snapshot to the result, i.e. including the time spent in the queue of the worker
+                perf.add_record('render (worker)', perf.widget_name(self), self._render_started,
+                                time.perf_counter() - self._render_started)
+            obtain_buffer_budget().touch(self)
+            self.update()
+        except Exception:
+            logging.exception("exception during rendering a figure in a worker")
+        self._submit_render()
+
+    def blit(self, bbox=None):
+        # blitting (e.g. a zoom preview) draws into the full resolution buffer, so that one is shown from now on
+        self._preview_frame = None
+        super().blit(bbox)
+
+    def buffer_rgba(self):
+        if self._async_frame is not None:
+            return memoryview(self._async_frame)
+        return super().buffer_rgba()
+
+    def paintEvent(self, event):
+        if self._resize_frame is not None:
+            frame = self._resize_frame
+        else:
+            frame = self._preview_frame if self._preview_frame is not None else self._async_frame
+        if frame is None:
+            super().paintEvent(event)
+            return
+        self._draw_idle()  # only does something if a draw is pending
+        frame = np.ascontiguousarray(frame)
+        height, width = frame.shape[:2]
+        painter = QPainter(self)
+        try:
+            image = QImage(frame.data, width, height, 4 * width, QImage.Format_RGBA8888)
+            # the frame is scaled if the canvas was resized while it was rendered
+            painter.drawImage(QRectF(self.rect()), image)
+            self._draw_rect_callback(painter)
+        finally:
+            painter.end()
 
     @classmethod
     def new_manager(cls, figure, num):
-        canvas = FigureCanvas(figure)
-        manager = FigureManagerQTDock(canvas, num)
+        # a figure created again (e.g. by a re-run notebook cell) reuses the dock and the canvas of the closed one
+        widget_instance = window().widgets.get(f"MplFigure__{num}")
+        widget = widget_instance.widget if widget_instance is not None else None
+        if isinstance(widget, MplFigure) and widget.parked and isinstance(widget.canvas, FigureCanvas):
+            canvas = widget.canvas
+            if isinstance(canvas.manager, FigureManagerQTDock):
+                canvas.manager.hand_over()
+            widget.set_figure(figure)
+            manager = FigureManagerQTDock(canvas, num, widget)
+        else:
+            canvas = FigureCanvas(figure)
+            manager = FigureManagerQTDock(canvas, num)
         canvas.manager = manager
         figure.canvas = canvas
         return manager
@@ -0,0 +1,112 @@
+import weakref
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    from .backend import FigureCanvas
+
+MEMORY_BUDGET = 512 * 2 ** 20  # bytes
+
+
+def buffer_bytes(canvas: 'FigureCanvas') -> int:
+    """
+    Returns the size of pixel buffers held by a canvas (the Agg renderer and frames rendered by a worker or during
+    interaction).
+    """
+    size = 0
+    renderer = canvas.__dict__.get('renderer')
+    if renderer is not None:
+        size += int(renderer.width) * int(renderer.height) * 4
+    for frame in (getattr(canvas, '_async_frame', None), getattr(canvas, '_preview_frame', None)):
+        if frame is not None:
+            size += frame.nbytes
+    return size
+
+
+class BufferBudget:
+    """
+    Limits the memory taken by pixel buffers of all canvases created by the backend.
+
+    Canvases are kept in the order they were last shown (or rendered while shown). When the total size of buffers
+    exceeds `budget`, the canvases that were shown least recently and are hidden now (e.g. in a background tab) drop
+    their buffers; they are rendered again when shown. Visible canvases are never evicted, so the budget may be exceeded
+    if they alone need more.
+    """
+
+    def __init__(self, budget: Optional[int] = MEMORY_BUDGET):
+        self.budget = budget  # `None` means no limit
+        self.evictions = 0
+        self._canvases = OrderedDict()  # type: OrderedDict[int, weakref.ref]  # least recently shown first
+
+    def touch(self, canvas: 'FigureCanvas'):
+        """
+        Marks the canvas as just shown (the most recently used) and evicts other buffers if needed.
+        """
+        key = id(canvas)
+        if key not in self._canvases:
+            self._canvases[key] = weakref.ref(canvas, lambda ref: self._canvases.pop(key, None))
+        self._canvases.move_to_end(key)
+        self.enforce()
+
+    def forget(self, canvas: 'FigureCanvas'):
+        self._canvases.pop(id(canvas), None)
+
+    def _alive(self):
+        return [canvas for canvas in (ref() for ref in list(self._canvases.values())) if canvas is not None]
+
+    def usage(self) -> Dict[str, int]:
+        """
+        Returns the size of pixel buffers (in bytes) held by each canvas, by the name of its dock.
+        """
+        from .perf import widget_name
+
+        result = {}
+        for canvas in self._alive():
+            name = widget_name(canvas)
+            result[name] = result.get(name, 0) + buffer_bytes(canvas)
+        return result
+
+    def total(self) -> int:
+        return sum(buffer_bytes(canvas) for canvas in self._alive())
+
+    def enforce(self):
+        if self.budget is None:
+            return
+        canvases = self._alive()
+        total = sum(buffer_bytes(canvas) for canvas in canvases)
+        for canvas in canvases:
+            if total <= self.budget:
+                break
+            if canvas.dock_visible:
+                continue
+            size = buffer_bytes(canvas)
+            if size:
+                canvas.drop_buffers()
+                self.evictions += 1
+                total -= size
+
+
+_buffer_budget = None  # type: Optional[BufferBudget]
+
+
+def obtain_buffer_budget() -> BufferBudget:
+    global _buffer_budget
+    if _buffer_budget is None:
+        _buffer_budget = BufferBudget()
+    return _buffer_budget
+
+
+def set_memory_budget(budget: Optional[int]):
+    """
+    Sets how many bytes pixel buffers of all canvases may take (`None` for no limit).
+    """
+    budget_keeper = obtain_buffer_budget()
+    budget_keeper.budget = budget
+    budget_keeper.enforce()
+
+
+def buffer_usage() -> Dict[str, int]:
+    """
+    Returns the size of pixel buffers (in bytes) held by the canvas of each dock.
+    """
+    return obtain_buffer_budget().usage()
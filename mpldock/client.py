@@ -0,0 +1,158 @@
+"""
+A backend showing figures in a running mpldock server (see `mpldock.server`) instead of in a window of the script:
+
+    matplotlib.use('module://mpldock.client')
+
+`plt.show()` sends all figures to the server and returns, so a script shows its plots in the already arranged layout of
+the server without starting Qt. A figure replaces the dock of the same name (its label, or its number if it has none),
+keeping its view. Figures that cannot be pickled are sent as rendered frames. If no server is running, one is started;
+it outlives the script. The `MPLDOCK_SERVER` environment variable selects a server other than the default one.
+
+The socket is created in `$XDG_RUNTIME_DIR`, or in a directory of the current user in the temporary directory; either
+must be accessible only by its owner, since messages are unpickled by the server.
+
+Nothing here imports Qt, so the backend is as cheap to load as Agg.
+"""
+import getpass
+import io
+import logging
+import os
+import pickle
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from matplotlib._pylab_helpers import Gcf
+from matplotlib.backend_bases import FigureManagerBase
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from .rendering import snapshot
+
+SERVER_NAME = os.environ.get('MPLDOCK_SERVER') or f"mpldock-{getpass.getuser()}"
+START_TIMEOUT = 15.0  # seconds to wait for a server started by the client
+
+HEADER = struct.Struct('>Q')  # every message is a pickled dict preceded by its length
+
+
+def _private_directory(path: str) -> bool:
+    info = os.lstat(path)
+    return stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & 0o077
+
+
+def _socket_directory() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isabs(runtime_dir) and os.path.isdir(runtime_dir) and _private_directory(runtime_dir):
+        return runtime_dir
+    # the temporary directory is shared, so someone else could have created it (to receive our messages)
+    path = os.path.join(tempfile.gettempdir(), f"mpldock-{os.getuid()}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    if not _private_directory(path):
+        raise Exception(f"{path} is not a directory accessible only by the current user")
+    return path
+
+
+def server_address(name: str = SERVER_NAME) -> str:
+    """
+    Returns the address a server with the given name listens on (a socket path, or a pipe on Windows).
+    """
+    if sys.platform == 'win32':
+        return rf'\\.\pipe\{name}'
+    return os.path.join(_socket_directory(), name)
+
+
+def encode_message(message: dict) -> bytes:
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    return HEADER.pack(len(data)) + data
+
+
+def _write(address: str, data: bytes):
+    if sys.platform == 'win32':
+        with open(address, 'wb') as pipe:
+            pipe.write(data)
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(address)
+        sock.sendall(data)
+
+
+def start_server(name: str = SERVER_NAME):
+    """
+    Starts a server in the background (detached from the current process).
+    """
+    kwargs = dict(start_new_session=True) if sys.platform != 'win32' else dict(
+        creationflags=subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP)
+    subprocess.Popen([sys.executable, '-m', 'mpldock.server', '--name', name], stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **kwargs)
+
+
+def send(message: dict, name: str = SERVER_NAME, start=True):
+    """
+    Sends a message to the server; starts the server if it isn't running (unless `start` is false).
+    """
+    data = encode_message(message)
+    address = server_address(name)
+    try:
+        _write(address, data)
+        return
+    except OSError:
+        if not start:
+            raise
+    start_server(name)
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            _write(address, data)
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def dock_name(figure: Figure, num=None) -> str:
+    # named like docks of the mpldock backend (see `backend.FigureManagerQTDock`), but labels are preferred, since they
+    # identify a figure across scripts
+    return f"MplFigure__{figure.get_label() or num}"
+
+
+def send_figure(figure: Figure, name: str = None, title: str = None, server: str = SERVER_NAME):
+    """
+    Shows a figure in the server, in the dock `name` (by default named by the label of the figure).
+    """
+    name = name or dock_name(figure, getattr(figure.canvas.manager, 'num', None))
+    title = title or figure.get_label() or name
+    try:
+        message = dict(kind='figure', name=name, title=title, figure=snapshot(figure))
+    except Exception:
+        logging.warning(f"cannot pickle figure '{title}'; sending a rendered frame instead", exc_info=True)
+        frame = io.BytesIO()
+        figure.savefig(frame, format='png')
+        message = dict(kind='frame', name=name, title=title, frame=frame.getvalue())
+    send(message, server)
+
+
+class FigureManagerClient(FigureManagerBase):
+    def show(self):
+        send_figure(self.canvas.figure, dock_name(self.canvas.figure, self.num), self.get_window_title())
+
+
+class FigureCanvasClient(FigureCanvasAgg):
+    manager_class = FigureManagerClient
+
+
+# entry points of the backend
+FigureCanvas = FigureCanvasClient
+FigureManager = FigureManagerClient
+
+
+def show(*args, **kwargs):
+    for manager in Gcf.get_all_fig_managers():
+        manager.show()
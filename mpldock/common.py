@@ -1,10 +1,13 @@
 from numbers import Number
-from typing import Callable, Dict, Any, Union, Tuple, List
+from typing import TYPE_CHECKING, Callable, Dict, Any, Union, Tuple, List
 
-from PyQt5.QtWidgets import QWidget
+if TYPE_CHECKING:
+    from PyQt5.QtWidgets import QWidget
 
+LAYOUT_PAD = 0.5  # of `tight_layout` of figures in docks (also when they are exported)
 
-def named(widget: QWidget, name, title=None) -> QWidget:
+
+def named(widget: 'QWidget', name, title=None) -> 'QWidget':
     if title is None:
         title = name
     widget.setObjectName(name)
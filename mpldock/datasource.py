@@ -0,0 +1,277 @@
+"""
+Out-of-core data sources: lines whose samples stay on disk (`np.memmap`, HDF5/zarr datasets or anything else supporting
+slicing) and are read only as far as the current view needs them.
+
+The samples are split into chunks of `chunk_size` bins. A bin of level `k` covers `2 ** k` consecutive samples and is
+shown by its first, minimal, maximal and last sample (see `lod.minmax_indexes`), so the envelope of the line is kept.
+The level is the coarsest one leaving at least two bins per pixel column of the visible range. Bins with more than
+`max_samples_per_bin` samples are computed from evenly strided samples, which bounds the amount of data read for a
+zoomed-out view (narrow spikes may be missed there; they show up when zoomed in).
+
+Chunks are read in a background thread, the visible ones first and then their neighbours (prefetching), and kept in a
+cache of bounded size. Until a chunk is read, a cached coarser chunk covering it is shown instead.
+"""
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+from matplotlib.axes import Axes
+
+from mpldock.lod import minmax_indexes
+
+CHUNK_SIZE = 4096  # bins
+CACHE_BYTES = 128 * 2 ** 20
+MAX_SAMPLES_PER_BIN = 64
+PREFETCH_CHUNKS = 2  # on each side of the visible range
+FALLBACK_LEVELS = 4  # how much coarser a chunk shown in place of a missing one may be
+
+ChunkKey = Tuple[int, int]  # level, index
+Chunk = Tuple[np.ndarray, np.ndarray]  # x, y
+
+_executor = None  # type: Optional[ThreadPoolExecutor]
+
+
+def _obtain_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mpldock-datasource')
+    return _executor
+
+
+class ChunkCache:
+    """
+    Least recently used chunks up to `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._chunks = OrderedDict()  # type: OrderedDict[ChunkKey, Chunk]
+
+    def __contains__(self, key: ChunkKey):
+        return key in self._chunks
+
+    def get(self, key: ChunkKey) -> Optional[Chunk]:
+        chunk = self._chunks.get(key)
+        if chunk is not None:
+            self._chunks.move_to_end(key)
+        return chunk
+
+    def put(self, key: ChunkKey, chunk: Chunk):
+        if key in self._chunks:
+            return
+        self._chunks[key] = chunk
+        self.bytes += chunk[0].nbytes + chunk[1].nbytes
+        while self.bytes > self.max_bytes and len(self._chunks) > 1:
+            _, (x, y) = self._chunks.popitem(last=False)
+            self.bytes -= x.nbytes + y.nbytes
+
+    def clear(self):
+        self._chunks.clear()
+        self.bytes = 0
+
+
+class DataSource(QObject):
+    """
+    Uniformly sampled data read lazily in chunks: sample `i` of `data` lies at `x0 + i * dx`.
+
+    :param data: A 1-d array-like supporting `len` and slicing with a step (e.g. `np.memmap`, or a column of one).
+    """
+    chunk_ready = pyqtSignal(object)  # ChunkKey
+
+    _chunk_read = pyqtSignal(object, Future)
+
+    def __init__(self, data, x0: float = 0.0, dx: float = 1.0, chunk_size: int = CHUNK_SIZE,
+                 cache_bytes: int = CACHE_BYTES, max_samples_per_bin: int = MAX_SAMPLES_PER_BIN):
+        super().__init__()
+        self.data = data
+        self.x0 = x0
+        self.dx = dx
+        self.chunk_size = chunk_size
+        self.max_samples_per_bin = max_samples_per_bin
+        self.cache = ChunkCache(cache_bytes)
+        self._pending = {}  # type: Dict[ChunkKey, Future]
+        self._chunk_read.connect(self._on_chunk_read)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def x_range(self) -> Tuple[float, float]:
+        return self.x0, self.x0 + self.dx * max(len(self) - 1, 0)
+
+    def chunk_span(self, level: int) -> int:
+        """
+        Returns the number of samples covered by a chunk of the level.
+        """
+        return self.chunk_size << level
+
+    def read(self, level: int, index: int) -> Chunk:
+        """
+        Reads a chunk synchronously (called by the background thread).
+        """
+        bin_size = 1 << level
+        start = index * self.chunk_span(level)
+        stop = min(start + self.chunk_span(level), len(self))
+        if level == 0:
+            y = np.asarray(self.data[start:stop], dtype=float)
+            return self.x0 + self.dx * np.arange(start, stop), y
+
+        stride = max(bin_size // self.max_samples_per_bin, 1)
+        y = np.asarray(self.data[start:stop:stride], dtype=float)
+        per_bin = bin_size // stride
+        n_bins = -(-len(y) // per_bin)
+        padded = np.empty(n_bins * per_bin)
+        padded[:len(y)] = y
+        # the partial last bin is padded with its last sample, which changes neither its minimum nor its maximum
+        padded[len(y):] = y[-1] if len(y) else 0.0
+        bins = padded.reshape(n_bins, per_bin)
+        first = np.arange(n_bins) * per_bin
+        imin = first + np.argmin(bins, axis=1)
+        imax = first + np.argmax(bins, axis=1)
+        last = np.minimum(first + per_bin, len(y)) - 1
+        idx = minmax_indexes(np.minimum(imin, last), np.minimum(imax, last), first, last)
+        return self.x0 + self.dx * (start + idx * stride), y[idx]
+
+    def request(self, keys: List[ChunkKey]):
+        """
+        Schedules reading of chunks (in the given order) that are neither cached nor being read. Requests of other
+        chunks that have not started yet are dropped, so the reader follows the view.
+        """
+        wanted = set(keys)
+        for key, future in list(self._pending.items()):
+            if key not in wanted and future.cancel():
+                self._pending.pop(key, None)  # unless already removed by `_on_chunk_read`
+        for key in keys:
+            if key in self.cache or key in self._pending:
+                continue
+            future = _obtain_executor().submit(self.read, *key)
+            self._pending[key] = future
+            future.add_done_callback(lambda future, key=key: self._chunk_read.emit(key, future))
+
+    def _on_chunk_read(self, key: ChunkKey, future: Future):
+        if self._pending.get(key) is future:
+            del self._pending[key]
+        if future.cancelled():
+            return
+        try:
+            self.cache.put(key, future.result())
+        except Exception:
+            logging.exception(f"exception during reading chunk {key}")
+            return
+        self.chunk_ready.emit(key)
+
+
+class SourceLine:
+    """
+    A line showing a `DataSource`. Whenever the x-limits or the canvas size change, the chunks covering the visible
+    range at the resolution of the canvas are shown (or read if they are not cached).
+    """
+
+    def __init__(self, ax: Axes, source: DataSource, prefetch: int = PREFETCH_CHUNKS, **line_kwargs):
+        self.source = source
+        self.prefetch = prefetch
+        self.line, = ax.plot([], [], **line_kwargs)
+        self.level = 0  # level of the shown chunks
+        self._shown = None  # keys of the chunks shown in place of the visible ones
+        self._wanted = set()
+
+        source.chunk_ready.connect(self._on_chunk_ready)
+        self._xlim_cid = ax.callbacks.connect('xlim_changed', lambda ax: self.update())
+        self._resize_cid = ax.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+        if len(source):
+            ax.set_xlim(*source.x_range)  # calls `update`
+
+    def _visible_samples(self) -> Tuple[int, int]:
+        xmin, xmax = sorted(self.line.axes.get_xlim())
+        n = len(self.source)
+        i0 = int(np.clip(np.floor((xmin - self.source.x0) / self.source.dx) - 1, 0, n))
+        i1 = int(np.clip(np.ceil((xmax - self.source.x0) / self.source.dx) + 2, 0, n))
+        return i0, i1
+
+    def update(self):
+        ax = self.line.axes
+        if ax is None or not len(self.source):
+            return
+        i0, i1 = self._visible_samples()
+        samples_per_pixel = (i1 - i0) / max(ax.bbox.width, 1)
+        level = int(np.floor(np.log2(samples_per_pixel / 2))) if samples_per_pixel >= 4 else 0
+        self.level = level
+
+        span = self.source.chunk_span(level)
+        c0, c1 = i0 // span, max((i1 - 1) // span, i0 // span)
+        n_chunks = -(-len(self.source) // span)
+        visible = [(level, c) for c in range(c0, c1 + 1)]
+        neighbours = [(level, c) for d in range(1, self.prefetch + 1) for c in (c1 + d, c0 - d) if 0 <= c < n_chunks]
+        self._wanted = set(visible)
+        self.source.request(visible + neighbours)
+        self._show(visible)
+
+    def _show(self, visible: List[ChunkKey]):
+        keys = [self._available(level, index) for level, index in visible]
+        if keys == self._shown:
+            return
+        self._shown = keys
+
+        xs, ys = [], []
+        for (level, index), key in zip(visible, keys):
+            if key is None:
+                # not read yet; the line is interrupted there
+                xs.append(np.array([np.nan]))
+                ys.append(np.array([np.nan]))
+                continue
+            x, y = self.source.cache.get(key)
+            if key[0] != level:
+                # a coarser chunk covers also its neighbours, which may be shown at the right level
+                span = self.source.chunk_span(level)
+                inside = ((x >= self.source.x0 + self.source.dx * index * span)
+                          & (x < self.source.x0 + self.source.dx * (index + 1) * span))
+                x, y = x[inside], y[inside]
+            xs.append(x)
+            ys.append(y)
+        self.line.set_data(np.concatenate(xs), np.concatenate(ys))
+
+        ax = self.line.axes
+        if ax.get_autoscaley_on() and any(key is not None for key in keys):
+            # only y follows the data; x is the view the data is read for
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+        ax.figure.canvas.draw_idle()
+
+    def _available(self, level: int, index: int) -> Optional[ChunkKey]:
+        """
+        Returns the key of the cached chunk to show in place of the given one: the chunk itself or a coarser one.
+        """
+        for coarser in range(FALLBACK_LEVELS + 1):
+            key = level + coarser, index >> coarser
+            if key in self.source.cache:
+                return key
+        return None
+
+    def _on_chunk_ready(self, key: ChunkKey):
+        if key in self._wanted:
+            self.update()  # a missing or coarser chunk gets replaced
+
+    def disconnect(self):
+        ax = self.line.axes
+        if ax is not None:
+            ax.callbacks.disconnect(self._xlim_cid)
+            ax.figure.canvas.mpl_disconnect(self._resize_cid)
+        self.source.chunk_ready.disconnect(self._on_chunk_ready)
+
+
+def plot_source(ax: Axes, data, x0: float = 0.0, dx: float = 1.0, cache_bytes: int = CACHE_BYTES,
+                **line_kwargs) -> SourceLine:
+    """
+    Plots uniformly sampled data too large to be loaded into memory, reading only what the view shows.
+
+        samples = np.memmap('recording.f32', dtype=np.float32, mode='r')
+        plot_source(ax, samples, dx=1 / sample_rate)
+
+    :param data: A 1-d array-like supporting slicing (e.g. `np.memmap`); sample `i` lies at `x0 + i * dx`.
+    :param cache_bytes: Memory for the chunks read.
+    """
+    return SourceLine(ax, DataSource(data, x0=x0, dx=dx, cache_bytes=cache_bytes), **line_kwargs)
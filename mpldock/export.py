@@ -0,0 +1,263 @@
+"""
+Headless export of figures in a persisted layout: every figure gets the view (axes limits, scales, grids) saved in the
+state file and the size of its dock, and is rendered to files in a pool of processes, without showing a window.
+
+    mpldock-export --state FILE [--output DIR] [--format png] [--format pdf] [--dpi 100] [--composite] SCRIPT [ARG...]
+
+The script is run with a non-interactive backend (`plt.show`, switching the backend and `window`, `persist_layout` and
+`run` of mpldock do nothing), and its pyplot figures are matched to the docks of the layout by number, the same way the
+mpldock backend names them.
+"""
+import argparse
+import logging
+import os
+import pickle
+import runpy
+import struct
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import get_context
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from . import indexedstate, rendering
+from .common import LAYOUT_PAD, DumpedState
+from .statemanager import read_state
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+DPI = 100
+FORMATS = ('png',)
+
+Rect = Tuple[int, int, int, int]  # x, y, width, height in pixels
+
+# where `QWidget::saveGeometry` puts the width of the screen (formats 2 and newer): after the magic number, the
+# version, frame and normal geometry, the screen number and the maximized and full screen flags
+SCREEN_WIDTH = struct.Struct('>4x2H32x4x2xI')
+
+
+def figure_dock_name(num: int) -> str:
+    # see `backend.FigureManagerQTDock`
+    return f"MplFigure__{num}"
+
+
+@contextmanager
+def _headless_pyplot():
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import mpldock
+    from mpldock import windows
+
+    matplotlib.use('agg')
+    patched = [(matplotlib, 'use'), (plt, 'show'), (plt, 'switch_backend')]
+    patched += [(module, name) for module in (mpldock, windows) for name in ('window', 'persist_layout', 'run')]
+    originals = [getattr(module, name) for module, name in patched]
+    for module, name in patched:
+        setattr(module, name, lambda *args, **kwargs: None)
+    try:
+        yield plt
+    finally:
+        for (module, name), original in zip(patched, originals):
+            setattr(module, name, original)
+
+
+def run_script(path: str, argv: Sequence[str] = ()) -> Dict[str, 'Figure']:
+    """
+    Runs a script headlessly and returns its pyplot figures by dock name.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')  # in case the script shows a widget anyway
+    sys_argv = sys.argv
+    sys.argv = [path, *argv]
+    try:
+        with _headless_pyplot() as plt:
+            runpy.run_path(path, run_name='__main__')
+            return {figure_dock_name(num): plt.figure(num) for num in plt.get_fignums()}
+    finally:
+        sys.argv = sys_argv
+
+
+def _any_screen_geometry(geometry: bytes) -> bytes:
+    # Qt rejects a geometry saved on a screen much wider or narrower than the current one (the offscreen one is 800
+    # pixels wide), unless the width of the screen is unknown
+    if len(geometry) < SCREEN_WIDTH.size or SCREEN_WIDTH.unpack_from(geometry)[0] < 2:
+        return geometry
+    return geometry[:SCREEN_WIDTH.size - 4] + bytes(4) + geometry[SCREEN_WIDTH.size:]
+
+
+def dock_rects(window_state: DumpedState) -> Tuple[Tuple[int, int], Dict[str, Rect]]:
+    """
+    Restores a window layout offscreen and returns the window size and the content rectangles of visible docks (docks
+    in background tabs and floating ones are left out).
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QPoint, Qt
+    from PyQt5.QtWidgets import QApplication, QDockWidget, QMainWindow, QWidget
+
+    app = QApplication.instance() or QApplication([])
+    window = QMainWindow()
+    window.setDockNestingEnabled(True)
+    window.setCentralWidget(None)
+    window.menuBar().addMenu("&File")  # takes the same space as the menu of `Window`
+    docks = {}
+    for name, (title, _) in window_state['widgets'].items():
+        dock = QDockWidget(title)
+        dock.setObjectName(f"{name}__docked")  # see `Window.add`
+        dock.setWidget(QWidget())
+        window.addDockWidget(Qt.RightDockWidgetArea, dock)
+        docks[name] = dock
+    window.restoreGeometry(_any_screen_geometry(bytes.fromhex(window_state['geometry'])))
+    window.restoreState(bytes.fromhex(window_state['state']))
+    window.show()
+    app.processEvents()
+
+    rects = {}
+    for name, dock in docks.items():
+        if dock.isFloating() or dock.visibleRegion().isEmpty():
+            continue
+        content = dock.widget()
+        origin = content.mapTo(window, QPoint(0, 0))
+        rects[name] = origin.x(), origin.y(), content.width(), content.height()
+    size = window.width(), window.height()
+    window.close()
+    window.deleteLater()
+    return size, rects
+
+
+def render_dock(snapshot: bytes, axes_state: Sequence[DumpedState], size: Optional[Tuple[int, int]], dpi: float,
+                paths: Sequence[str], want_pixels: bool) -> Optional[np.ndarray]:
+    """
+    Renders a pickled figure with the saved view, laid out at the size of its dock, to files (meant to be run in a
+    worker process). Returns the RGBA image if `want_pixels` is set.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from mpldock import axesstate
+
+    figure = pickle.loads(snapshot)
+    canvas = FigureCanvasAgg(figure)
+    axesstate.apply(axesstate.match(figure.axes, axes_state))
+    if size is not None:
+        figure.set_size_inches(size[0] / dpi, size[1] / dpi)
+    figure.set_dpi(dpi)
+    # laid out like in the dock (see `FigureLayout`)
+    figure.tight_layout(pad=LAYOUT_PAD)
+    for path in paths:
+        figure.savefig(path, dpi=dpi)
+    if want_pixels:
+        canvas.draw()
+        return np.array(canvas.buffer_rgba())
+    return None
+
+
+def _compose(size: Tuple[int, int], rects: Mapping[str, Rect], images: Mapping[str, np.ndarray]) -> np.ndarray:
+    width, height = size
+    composite = np.full((height, width, 4), 255, dtype=np.uint8)
+    for name, (x, y, w, h) in rects.items():
+        image = images.get(name)
+        if image is None:
+            continue
+        h, w = min(h, image.shape[0], height - y), min(w, image.shape[1], width - x)
+        composite[y:y + h, x:x + w] = image[:h, :w]
+    return composite
+
+
+def export_figures(figures: Mapping[str, 'Figure'], state_path: str, output_dir: str, formats: Iterable[str] = FORMATS,
+                   dpi: float = DPI, composite=False, executor: Executor = None) -> List[str]:
+    """
+    Renders figures with the view saved in a layout state file to `output_dir` (`<dock name>.<format>`).
+    :param figures: Figures by dock name (e.g. `MplFigure__1` for pyplot figure 1, see `run_script`).
+    :param state_path: A state file saved by mpldock (e.g. with `persist_layout` or `Layout`/`Save`).
+    :param composite: Also save the arrangement of docks of each window as `composite-<window>.<format>`.
+    :param executor: A process pool; by default one with a process per CPU is started.
+    :return: Paths of written files. If some figures fail to render, the others are exported and then an exception is
+        raised.
+    """
+    from matplotlib.image import imsave
+
+    formats = list(formats)
+    os.makedirs(output_dir, exist_ok=True)
+    state = indexedstate.materialize(read_state(state_path))
+    windows = {name: s for name, s in state['clients'].items() if isinstance(s, Mapping) and 'widgets' in s}
+
+    layouts = {name: dock_rects(window_state) for name, window_state in windows.items()}
+    sizes = {dock: rect[2:] for size, rects in layouts.values() for dock, rect in rects.items()}
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(mp_context=get_context('spawn'))
+    written = []
+    failed = []
+    futures = {}
+    try:
+        for name, figure in figures.items():
+            axes_state = []
+            for window_state in windows.values():
+                entry = window_state['widgets'].get(name)
+                if entry is not None:
+                    axes_state = entry[1].get('axes', [])
+            paths = [os.path.join(output_dir, f"{name}.{fmt}") for fmt in formats]
+            futures[name] = paths, executor.submit(render_dock, rendering.snapshot(figure), axes_state, sizes.get(name),
+                                                   dpi, paths, composite and name in sizes)
+
+        images = {}
+        for name, (paths, future) in futures.items():
+            try:
+                images[name] = future.result()
+                written += paths
+            except Exception:
+                logging.exception(f"exception during exporting '{name}'")
+                failed.append(name)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    for window_name, (size, rects) in layouts.items() if composite else ():
+        image = _compose(size, rects, images)
+        for fmt in formats:
+            path = os.path.join(output_dir, f"composite-{window_name}.{fmt}")
+            imsave(path, image, format=fmt)
+            written.append(path)
+    if failed:
+        raise Exception(f"cannot export {', '.join(failed)}")
+    return written
+
+
+def export_script(script: str, state_path: str, output_dir: str, formats: Iterable[str] = FORMATS, dpi: float = DPI,
+                  composite=False, argv: Sequence[str] = (), executor: Executor = None) -> List[str]:
+    """
+    Runs a script headlessly and exports its figures, see `export_figures`.
+    """
+    return export_figures(run_script(script, argv), state_path, output_dir, formats, dpi, composite, executor)
+
+
+def main(args: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description="Render figures of a script with a saved mpldock layout to files.")
+    parser.add_argument('script', help="a script creating pyplot figures")
+    parser.add_argument('script_args', nargs=argparse.REMAINDER,
+                        help="arguments passed to the script (options of the export go before the script)")
+    parser.add_argument('--state', required=True, help="a layout state file (.json or .mpldock)")
+    parser.add_argument('--output', default='.', help="output directory")
+    parser.add_argument('--format', action='append', dest='formats', help="png (default), pdf, svg... (repeatable)")
+    parser.add_argument('--dpi', type=float, default=DPI)
+    parser.add_argument('--composite', action='store_true', help="also save the arrangement of docks")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes")
+    args = parser.parse_args(args)
+
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context('spawn'))
+    try:
+        written = export_script(args.script, args.state, args.output, args.formats or FORMATS, args.dpi,
+                                args.composite, args.script_args, executor)
+    except Exception as e:
+        logging.error(str(e))
+        return 1
+    finally:
+        executor.shutdown()
+    for path in written:
+        print(path)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,24 +1,39 @@
 import logging
-from math import exp, log
+from typing import Dict, Tuple
 
+import numpy as np
 from PyQt5 import QtGui
-from PyQt5.QtCore import QSize, Qt
+from PyQt5.QtCore import QSize, Qt, QTimer, pyqtSignal
 from PyQt5.QtWidgets import QVBoxLayout, QWidget
 from matplotlib.axes import Axes
 from matplotlib.axis import Axis
 from matplotlib.backend_bases import MouseEvent, key_press_handler
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
+from matplotlib.colors import to_rgba
 from matplotlib.figure import Figure
+from matplotlib.transforms import Transform
 
+from mpldock import axesstate, perf
 from mpldock.common import DumpedState
+from mpldock.layout import FigureLayout
 from mpldock.tweaks import tweak_axes
 
 FigureCanvas = FigureCanvasQTAgg
 
 MODIFIER_KEYS = {'shift', 'control', 'alt'}
 
+SCALE_PER_TICK = 1.3
+ZOOM_SETTLE_MS = 150  # a wheel gesture is considered finished after that long without a tick
+
+Lims = Tuple[float, float]
+
 
 class MplFigure(QWidget):
+    # merge bursts of wheel ticks into one limit change and show a scaled copy of the last frame in the meantime
+    interactive_zoom = True
+
+    state_changed = pyqtSignal()  # emitted when something saved by `dump_state` may have changed
+
     def __init__(self, canvas: FigureCanvasQTAgg):
         super().__init__()
         self.layout = QVBoxLayout(self)
@@ -32,6 +47,32 @@ class MplFigure(QWidget):
 
         self.figure = canvas.figure  # type: Figure
 
+        self._create_toolbar()
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+        if hasattr(self.canvas, 'resize_finished'):  # see `backend.FigureCanvas`
+            self.canvas.resize_finished.connect(self._on_resize_finished)
+
+        self.current_modifiers = set()
+        self.dock_visible = True
+        self.restored_axes = set()
+
+        self.axes_state_to_restore = []
+        self.figure_layout = FigureLayout(self.figure, self)
+
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(ZOOM_SETTLE_MS)
+        self._zoom_timer.timeout.connect(self._finish_zoom)
+        self._pending_lims = {}  # type: Dict[Axes, Tuple[Lims, Lims]]
+        self._zoom_start_lims = {}  # type: Dict[Axes, Tuple[Lims, Lims]]
+        self._zoom_frame = None  # copy of the agg buffer taken at the beginning of the gesture
+        self._parked_state = None  # the view kept by `park`
+
+        self._connect_figure()
+        self.setMinimumSize(200, 200)
+
+    def _create_toolbar(self):
         self.mpl_toolbar = NavigationToolbar(self.canvas, self)
         self.layout.addWidget(self.mpl_toolbar)
 
@@ -43,25 +84,84 @@ class MplFigure(QWidget):
         self.mpl_toolbar.layout().setContentsMargins(0, 0, 0, 0)
         self.mpl_toolbar.setIconSize(QSize(16, 16))
         self.mpl_toolbar.layout().setSpacing(2)
-        self.layout.setContentsMargins(0, 0, 0, 0)
+        self.mpl_toolbar.pan()  # we usually want to pan with mouse, since zooming is on the scroll
 
-        # self.mpl_toolbar.setHeight(20)
+    def _connect_figure(self):
+        # callbacks connected through the canvas are registered in its figure
         self.canvas.mpl_connect('key_press_event', self.on_key_press)
         self.canvas.mpl_connect('scroll_event', self.on_scroll)
         self.canvas.mpl_connect('key_release_event', self.on_key_release)
-        self.mpl_toolbar.pan()  # we usually want to pan with mouse, since zooming is on the scroll
+        self.figure.add_axobserver(lambda figure: self._restore_existing_axes())
+        self._restore_existing_axes()  # the figure may have axes already (e.g. built before being docked)
 
-        self.current_modifiers = set()
-        self.restored_axes = set()
+    @property
+    def parked(self) -> bool:
+        return self._parked_state is not None
+
+    def set_figure(self, figure: Figure):
+        """
+        Shows another figure in place of the current one, reusing the canvas (see `backend.FigureCanvas.set_figure`).
+        The new figure takes over the view kept by `park`.
+        """
+        state = self._parked_state
+        self._parked_state = None
+        self._cancel_zoom()
+        self.canvas.set_figure(figure)
+        self.figure = figure
+        self.figure_layout.figure = figure
+        self.figure_layout.invalidate()
+
+        # the toolbar keeps the navigation history and its callbacks in the old figure
+        self.canvas.widgetlock.release(self.mpl_toolbar)
+        self.layout.removeWidget(self.mpl_toolbar)
+        self.mpl_toolbar.deleteLater()
+        self._create_toolbar()
 
+        self.restored_axes = set()
         self.axes_state_to_restore = []
-        self.figure.add_axobserver(lambda figure: self._restore_existing_axes())
-        self.setMinimumSize(200, 200)
+        self._connect_figure()
+        if state is not None:
+            self.restore_state(state)
+
+    def park(self):
+        """
+        Lets go of the figure (e.g. closed in pyplot), so it can be freed, but keeps the canvas with the last frame and
+        the view of the figure. A figure shown here later by `set_figure` reuses the canvas and its buffers and takes
+        over the view, which is also what `dump_state` returns meanwhile.
+        """
+        state = self.dump_state()
+        self.figure_layout.cancel()
+        # an empty figure of the same size and dpi, so the buffer with the last frame is kept
+        self.set_figure(Figure(dpi=getattr(self.figure, '_original_dpi', self.figure.dpi)))
+        self._parked_state = state
+
+    def release(self):
+        """
+        Stops everything pending and frees the buffers before the widget is deleted (e.g. removed from the window).
+        """
+        self._cancel_zoom()
+        self.figure_layout.cancel()
+        release = getattr(self.canvas, 'release', None)  # see `backend.FigureCanvas`
+        if release is not None:
+            release()
 
     @property
     def visibilityChanged(self):
         return self.parentWidget().visibilityChanged
 
+    def track_dock_visibility(self):
+        """
+        Follows the visibility of the dock the figure is placed in, so the canvas is not rendered while hidden (e.g. in
+        a background tab). Must be called after the figure is docked.
+        """
+        self.dock_visible = self.parentWidget().isVisible()
+        self.canvas.set_dock_visible(self.dock_visible)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def _on_visibility_changed(self, visible: bool):
+        self.dock_visible = visible
+        self.canvas.set_dock_visible(visible)
+
     def on_key_press(self, event):
         if event.key in MODIFIER_KEYS:
             self.current_modifiers.add(event.key)
@@ -69,25 +169,46 @@ class MplFigure(QWidget):
         # implement the default mpl key press events described at
         # http://matplotlib.org/users/navigation_toolbar.html#navigation-keyboard-shortcuts
         key_press_handler(event, self.canvas, self.mpl_toolbar)
+        self.state_changed.emit()  # e.g. grid or scale toggled
 
     def on_key_release(self, event):
         if event.key in MODIFIER_KEYS and event.key in self.current_modifiers:
             self.current_modifiers.remove(event.key)
 
     @staticmethod
-    def get_scaled_lim(lim, focus, scale_factor, mode: str):
-        # Todo: use some generic method to support any scale
-        if mode == 'linear':
-            return [(l - focus) * scale_factor + focus for l in lim]
-        elif mode == 'log':
-            return [exp((log(l) - log(focus)) * scale_factor + log(focus)) for l in lim]
-        else:
-            logging.error("cannot zoom on '{}' scale".format(mode))
+    def get_scaled_lim(lim, focus, scale_factor, transform: Transform):
+        """
+        Scales `lim` around `focus` in the space of the axis scale `transform`, so any scale (not only linear and log)
+        zooms evenly.
+        """
+        l0, l1, f = transform.transform(np.array([lim[0], lim[1], focus], dtype=float))
+        if not np.all(np.isfinite([l0, l1, f])):
+            logging.error("cannot zoom around {} within {}".format(focus, lim))
+            return lim
+        return tuple(transform.inverted().transform(np.array([(l0 - f) * scale_factor + f,
+                                                              (l1 - f) * scale_factor + f])))
+
+    @staticmethod
+    def get_focus(lim, fraction, transform: Transform):
+        """
+        Returns the data value lying at `fraction` (0..1) of the axis extent when it shows `lim`.
+        """
+        l0, l1 = transform.transform(np.array(lim, dtype=float))
+        return transform.inverted().transform(np.array([l0 + (l1 - l0) * fraction]))[0]
 
     def on_scroll(self, event: MouseEvent):
+        with perf.measure('scroll', self.objectName()):
+            self._scroll(event)
+
+    def _scroll(self, event: MouseEvent):
         ax = event.inaxes
+        if ax is None:
+            return
+
+        begin_interaction = getattr(self.canvas, 'begin_interaction', None)  # see `backend.FigureCanvas`
+        if begin_interaction is not None:
+            begin_interaction()
 
-        SCALE_PER_TICK = 1.3
         if event.button == 'up':
             scale_factor = 1 / SCALE_PER_TICK
         elif event.button == 'down':
@@ -96,84 +217,164 @@ class MplFigure(QWidget):
             # deal with something that should never happen
             scale_factor = 1
 
+        # limits are taken from the pending (not yet applied) zoom, so the focus has to be computed from pixels
+        xlim, ylim = self._pending_lims.get(ax) or (ax.get_xlim(), ax.get_ylim())
+        bbox = ax.bbox
+        x_transform = ax.xaxis.get_transform()
+        y_transform = ax.yaxis.get_transform()
+
         if 'control' not in self.current_modifiers:
-            ax.set_xlim(self.get_scaled_lim(ax.get_xlim(), event.xdata, scale_factor, ax.get_xscale()))
+            focus = self.get_focus(xlim, (event.x - bbox.x0) / bbox.width, x_transform)
+            xlim = self.get_scaled_lim(xlim, focus, scale_factor, x_transform)
 
         if 'shift' not in self.current_modifiers:
-            ax.set_ylim(self.get_scaled_lim(ax.get_ylim(), event.ydata, scale_factor, ax.get_yscale()))
-
+            focus = self.get_focus(ylim, (event.y - bbox.y0) / bbox.height, y_transform)
+            ylim = self.get_scaled_lim(ylim, focus, scale_factor, y_transform)
+
+        if not self.interactive_zoom:
+            ax.set_xlim(xlim)
+            ax.set_ylim(ylim)
+            self.draw()
+            return
+
+        if ax not in self._zoom_start_lims:
+            self._zoom_start_lims[ax] = ax.get_xlim(), ax.get_ylim()
+        self._pending_lims[ax] = xlim, ylim
+        self._preview_zoom(ax)
+        self._zoom_timer.start()
+
+    def _cancel_zoom(self):
+        self._zoom_timer.stop()
+        self._pending_lims = {}
+        self._zoom_start_lims = {}
+        self._zoom_frame = None
+
+    def _finish_zoom(self):
+        pending_lims = self._pending_lims
+        self._pending_lims = {}
+        self._zoom_start_lims = {}
+        self._zoom_frame = None
+        for ax, (xlim, ylim) in pending_lims.items():
+            ax.set_xlim(xlim)
+            ax.set_ylim(ylim)
         self.draw()
 
+    @staticmethod
+    def _view_fraction(lim, start_lim, transform: Transform):
+        """
+        Returns where the ends of `lim` lie (as fractions) within `start_lim`, measured in the axis scale space.
+        """
+        s0, s1, l0, l1 = transform.transform(np.array([start_lim[0], start_lim[1], lim[0], lim[1]], dtype=float))
+        return (l0 - s0) / (s1 - s0), (l1 - s0) / (s1 - s0)
+
+    def _preview_zoom(self, ax: Axes):
+        """
+        Paints a nearest-neighbour scaled copy of the frame rendered before the gesture into the axes area and blits it.
+        """
+        try:
+            buffer = np.asarray(self.canvas.buffer_rgba())
+        except AttributeError:
+            return  # nothing was rendered yet
+        if self._zoom_frame is None:
+            self._zoom_frame = buffer.copy()
+        frame = self._zoom_frame
+        if frame.shape != buffer.shape:
+            return  # canvas was resized during the gesture
+
+        height, width = frame.shape[:2]
+        pixel_scale = width / self.figure.bbox.width  # the last frame may be rendered at a different resolution
+        x0, y0, x1, y1 = ax.bbox.extents * pixel_scale
+        left, right = max(int(round(x0)), 0), min(int(round(x1)), width)
+        top, bottom = max(height - int(round(y1)), 0), min(height - int(round(y0)), height)
+        if right <= left or bottom <= top:
+            return
+
+        (start_xlim, start_ylim), (xlim, ylim) = self._zoom_start_lims[ax], self._pending_lims[ax]
+        try:
+            ux0, ux1 = self._view_fraction(xlim, start_xlim, ax.xaxis.get_transform())
+            uy0, uy1 = self._view_fraction(ylim, start_ylim, ax.yaxis.get_transform())
+        except (ValueError, ZeroDivisionError):
+            return
+
+        v = (np.arange(right - left) + 0.5) / (right - left)
+        src_cols = np.floor(left + (ux0 + v * (ux1 - ux0)) * (right - left)).astype(int)
+        v = (np.arange(bottom - top) + 0.5) / (bottom - top)
+        # rows grow downwards while the axes coordinates grow upwards
+        src_rows = np.floor(bottom - (uy0 + (1 - v) * (uy1 - uy0)) * (bottom - top)).astype(int)
+
+        valid = (((src_rows >= top) & (src_rows < bottom))[:, None]
+                 & ((src_cols >= left) & (src_cols < right))[None, :])
+        region = frame[np.clip(src_rows, top, bottom - 1)[:, None], np.clip(src_cols, left, right - 1)[None, :]]
+        region[~valid] = np.array(to_rgba(ax.get_facecolor())) * 255
+        buffer[top:bottom, left:right] = region
+        self.canvas.blit(ax.bbox)
+
     def draw(self):
         self.canvas.draw_idle()
 
     def resizeEvent(self, a0: QtGui.QResizeEvent):
+        if getattr(self.canvas, 'resizing', False):
+            return  # laid out once at the final size, see `_on_resize_finished`
         self._tight_layout()
 
+    def _on_resize_finished(self):
+        self.figure_layout.request()
+        self.figure_layout.update()
+
+    def showEvent(self, a0: QtGui.QShowEvent):
+        self.figure_layout.update()
+
     def _tight_layout(self):
-        self.figure.tight_layout(pad=0.5)
+        self.figure_layout.request()
 
     def _restore_existing_axes(self):
-        for i, ax in enumerate(self.figure.axes):
-            if ax not in self.restored_axes:
-                self.restored_axes.add(ax)
-                if i < len(self.axes_state_to_restore):
-                    self.restore_axes_state(ax, self.axes_state_to_restore[i])
-                tweak_axes(ax)
+        new_axes = [ax for ax in self.figure.axes if ax not in self.restored_axes]
+        if not new_axes:
+            return
+        for ax in new_axes:
+            self.restored_axes.add(ax)
+            ax.callbacks.connect('xlim_changed', self._emit_state_changed)
+            ax.callbacks.connect('ylim_changed', self._emit_state_changed)
+        axesstate.apply((ax, state) for ax, state in axesstate.match(self.figure.axes, self.axes_state_to_restore)
+                        if ax in new_axes)
+        for ax in new_axes:
+            tweak_axes(ax)
         self._tight_layout()
 
+    def _emit_state_changed(self, *args):
+        self.state_changed.emit()
+
     @staticmethod
     def dump_axis_state(axis: Axis):
-        state = dict()
-        if axis.minorTicks and axis.minorTicks:
-            major = axis.majorTicks[0].gridline.get_visible()
-            minor = axis.minorTicks[0].gridline.get_visible()
-            if major or minor:
-                state['grid'] = dict(
-                    which='both' if major and minor else 'major' if major else 'minor'
-                )
-            else:
-                state['grid'] = None
-        return state
+        return axesstate.capture_axis(axis)
 
     @staticmethod
     def restore_axis_state(axis: Axis, state: dict):
-        if state['grid']:
-            axis.grid(True, **state['grid'])
-        else:
-            axis.grid(False)
+        axesstate.apply_axis(axis, state)
 
     @staticmethod
     def dump_axes_state(axes: Axes) -> DumpedState:
-        return dict(
-            xlim=axes.get_xlim(),
-            ylim=axes.get_ylim(),
-            xscale=axes.get_xscale(),
-            yscale=axes.get_yscale(),
-            x_axis=MplFigure.dump_axis_state(axes.get_xaxis()),
-            y_axis=MplFigure.dump_axis_state(axes.get_yaxis()),
-        )
+        return axesstate.capture_axes(axes)
 
     @staticmethod
     def restore_axes_state(axes, state: DumpedState):
-        if 'xlim' in state:
-            axes.set_xlim(state['xlim'])
-        if 'ylim' in state:
-            axes.set_ylim(state['ylim'])
-        if 'xscale' in state:
-            axes.set_xscale(state['xscale'])
-        if 'yscale' in state:
-            axes.set_yscale(state['yscale'])
-        if 'x_axis' in state:
-            MplFigure.restore_axis_state(axes.get_xaxis(), state['x_axis'])
-        if 'y_axis' in state:
-            MplFigure.restore_axis_state(axes.get_yaxis(), state['y_axis'])
+        axesstate.apply_axes(axes, state)
 
     def dump_state(self):
+        if self._parked_state is not None:
+            return self._parked_state
         return dict(
-            axes=[self.dump_axes_state(axes) for axes in self.figure.axes]
+            axes=axesstate.capture(self.figure.axes)
         )
 
     def restore_state(self, state: DumpedState):
+        if self._parked_state is not None:
+            self._parked_state = state  # for the next figure
+            return
         self.axes_state_to_restore = state['axes']
+        restored = [ax for ax in self.figure.axes if ax in self.restored_axes]
+        if restored:
+            axesstate.apply((ax, state) for ax, state in axesstate.match(self.figure.axes, self.axes_state_to_restore)
+                            if ax in restored)
+            self.canvas.draw_idle()
         self._restore_existing_axes()
@@ -0,0 +1,159 @@
+"""
+An indexed state format: the file starts with an index of client (and window widget) names to byte ranges, so a state
+is decoded only when it is asked for. Long hex-encoded blobs (e.g. `saveGeometry`/`saveState` of a window) may be
+compressed.
+
+Layout of a file::
+
+    MPLDOCK-STATE 1
+    {"clients": {"<name>": {"range": [offset, length], "widgets": {"<name>": {"title": "...", "range": [...]}}}}}
+    <json documents referenced by ranges (offsets are relative to the first byte after the index line)>
+"""
+import abc
+import base64
+import json
+import re
+import zlib
+from typing import Any, Dict, Iterator, Mapping, Sequence
+
+from .common import DumpedState
+
+MAGIC = b'MPLDOCK-STATE 1\n'
+ZHEX_KEY = '$zhex'
+MIN_COMPRESSED_LENGTH = 64
+
+_hex_pattern = re.compile('[0-9a-f]+')
+
+
+def _compress_hex(value):
+    if isinstance(value, str) and len(value) >= MIN_COMPRESSED_LENGTH and _hex_pattern.fullmatch(value):
+        return {ZHEX_KEY: base64.b64encode(zlib.compress(bytes.fromhex(value))).decode('ascii')}
+    return value
+
+
+def _decompress_hex(value):
+    if isinstance(value, dict) and len(value) == 1 and ZHEX_KEY in value:
+        return zlib.decompress(base64.b64decode(value[ZHEX_KEY])).hex()
+    return value
+
+
+def _has_widgets(client_state) -> bool:
+    # window states keep (title, state) pairs under 'widgets'; each of them is indexed separately
+    return isinstance(client_state, Mapping) and isinstance(client_state.get('widgets'), Mapping)
+
+
+def encode(state: DumpedState, compress=True) -> bytes:
+    body = bytearray()
+
+    def append(value) -> list:
+        data = json.dumps(value).encode('utf-8')
+        offset = len(body)
+        body.extend(data)
+        return [offset, len(data)]
+
+    index = {}
+    for name, client_state in state['clients'].items():
+        entry = {}
+        if _has_widgets(client_state):
+            entry['widgets'] = {
+                widget_name: dict(title=title, range=append(widget_state))
+                for widget_name, (title, widget_state) in client_state['widgets'].items()
+            }
+            client_state = {key: value for key, value in client_state.items() if key != 'widgets'}
+            if compress:
+                client_state = {key: _compress_hex(value) for key, value in client_state.items()}
+        entry['range'] = append(client_state)
+        index[name] = entry
+
+    return MAGIC + json.dumps(dict(clients=index)).encode('utf-8') + b'\n' + bytes(body)
+
+
+class _Body:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def decode(self, byte_range) -> Any:
+        offset, length = byte_range
+        return json.loads(self.data[offset:offset + length])
+
+
+class _WidgetEntry(Sequence):
+    """
+    A `(title, state)` pair whose state is decoded on first access.
+    """
+
+    def __init__(self, body: _Body, entry: Dict):
+        self._body = body
+        self._entry = entry
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, i):
+        if i in (0, -2):
+            return self._entry['title']
+        if i in (1, -1):
+            if 'state' not in self._entry:
+                self._entry['state'] = self._body.decode(self._entry['range'])
+            return self._entry['state']
+        raise IndexError(i)
+
+
+class _LazyMapping(Mapping):
+    def __init__(self, body: _Body, index: Dict):
+        self._body = body
+        self._index = index
+        self._decoded = {}
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __getitem__(self, name):
+        if name not in self._decoded:
+            self._decoded[name] = self._decode(self._index[name])
+        return self._decoded[name]
+
+    @abc.abstractmethod
+    def _decode(self, entry: Dict):
+        """
+        Returns the value described by an entry of the index.
+        """
+
+
+class _LazyWidgets(_LazyMapping):
+    def _decode(self, entry: Dict):
+        return _WidgetEntry(self._body, entry)
+
+
+class _LazyClients(_LazyMapping):
+    def _decode(self, entry: Dict):
+        client_state = self._body.decode(entry['range'])
+        if 'widgets' in entry:
+            client_state = {key: _decompress_hex(value) for key, value in client_state.items()}
+            client_state['widgets'] = _LazyWidgets(self._body, entry['widgets'])
+        return client_state
+
+
+def decode(data: bytes) -> DumpedState:
+    """
+    Returns a state whose clients (and window widgets) are decoded when accessed.
+    """
+    if not data.startswith(MAGIC):
+        raise Exception("not an indexed mpldock state")
+    index_end = data.index(b'\n', len(MAGIC))
+    index = json.loads(data[len(MAGIC):index_end])
+    return dict(clients=_LazyClients(_Body(data[index_end + 1:]), index['clients']))
+
+
+def materialize(state: Any) -> Any:
+    """
+    Converts lazily decoded parts of a state into plain containers (e.g. before encoding it in another format).
+    """
+    if isinstance(state, Mapping):
+        return {key: materialize(value) for key, value in state.items()}
+    if isinstance(state, _WidgetEntry):
+        return [state[0], materialize(state[1])]
+    return state
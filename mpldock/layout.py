@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from typing import Dict, Hashable
+
+from PyQt5.QtCore import QObject, QTimer
+from PyQt5.QtWidgets import QWidget
+from matplotlib.figure import Figure
+
+from mpldock import perf
+from mpldock.common import LAYOUT_PAD
+
+LAYOUT_DELAY_MS = 100
+CACHE_SIZE = 16
+
+SUBPLOT_PARAMS = ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+
+
+class FigureLayout(QObject):
+    """
+    Runs `tight_layout` of a figure shown in a dock only when it can make a difference.
+
+    Bursts of requests (e.g. resize events while dragging a splitter) are coalesced into one layout, a figure that is
+    not visible is laid out when it is shown and computed subplot parameters are reused as long as the canvas size and
+    the set of axes and labels stay the same.
+    """
+
+    def __init__(self, figure: Figure, widget: QWidget, delay_ms=LAYOUT_DELAY_MS, pad=LAYOUT_PAD,
+                 cache_size=CACHE_SIZE):
+        super().__init__(widget)
+        self.figure = figure
+        self.widget = widget
+        self.pad = pad
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()  # type: Dict[Hashable, Dict[str, float]]
+        self._pending = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.update)
+
+    def request(self):
+        """
+        Schedules a layout. Consecutive requests are merged.
+        """
+        self._pending = True
+        self._timer.start()
+
+    def update(self):
+        """
+        Performs a requested layout, unless the figure is hidden (then it waits until it is shown).
+        """
+        if not self._pending or not self.widget.isVisible():
+            return
+        self._pending = False
+        self._timer.stop()
+        self.apply()
+
+    def cancel(self):
+        self._pending = False
+        self._timer.stop()
+
+    def invalidate(self):
+        self._cache.clear()
+
+    def apply(self):
+        with perf.measure('tight_layout', perf.widget_name(self.widget)):
+            self._apply()
+
+    def _apply(self):
+        key = self._key()
+        params = self._cache.get(key)
+        if params is None:
+            self.figure.tight_layout(pad=self.pad)
+            params = self._current_params()
+            self._cache[key] = params
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+            if params == self._current_params():
+                return
+            self.figure.subplots_adjust(**params)
+        self.figure.canvas.draw_idle()
+
+    def _current_params(self):
+        return {name: getattr(self.figure.subplotpars, name) for name in SUBPLOT_PARAMS}
+
+    def _key(self):
+        axes_key = []
+        for ax in self.figure.axes:
+            subplotspec = ax.get_subplotspec() if hasattr(ax, 'get_subplotspec') else None
+            axes_key.append((
+                id(ax),
+                ax.get_visible(),
+                subplotspec.get_geometry() if subplotspec is not None else None,
+                ax.get_title(),
+                ax.get_xlabel(),
+                ax.get_ylabel(),
+                ax.get_xscale(),
+                ax.get_yscale(),
+                _tick_labels(ax.xaxis),
+                _tick_labels(ax.yaxis),
+            ))
+        return tuple(self.figure.bbox.size), self.figure.dpi, tuple(axes_key)
+
+
+def _tick_labels(axis):
+    # their extents change with the view (e.g. `1e5` becomes `100000` after zooming in), which calls for another layout
+    labels = tuple(label.get_text() for label in axis.get_ticklabels())
+    return labels, axis.get_major_formatter().get_offset()
@@ -0,0 +1,122 @@
+import itertools
+import weakref
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+
+link_groups = weakref.WeakValueDictionary()  # type: Dict[str, LinkGroup]
+_group_of_axes = weakref.WeakKeyDictionary()  # type: Dict[Axes, LinkGroup]
+_group_counter = itertools.count(1)
+
+
+class LinkGroup:
+    """
+    Axes (usually in different figures and docks) sharing x and/or y limits.
+
+    A change of limits of any member is copied to the others (once; changes made while propagating are not propagated
+    again) and all their canvases are rendered in the same frame of the frame scheduler. Membership is saved in the
+    state of `MplFigure`, so linked figures are linked again when the layout is restored.
+    """
+
+    def __init__(self, name: str, x=True, y=False):
+        self.name = name
+        self.x = x
+        self.y = y
+        self._axes = weakref.WeakKeyDictionary()  # type: Dict[Axes, List[int]]  # callback ids
+        self._syncing = False
+        link_groups[name] = self
+
+    @property
+    def axes(self) -> List['Axes']:
+        return list(self._axes.keys())
+
+    def add(self, *axes: 'Axes'):
+        for ax in axes:
+            old_group = _group_of_axes.get(ax)
+            if old_group is self:
+                continue
+            if old_group is not None:
+                old_group.remove(ax)
+
+            # adopt the limits of the group
+            reference = next(iter(self.axes), None)
+            if reference is not None:
+                self._apply_lims(reference, [ax])
+
+            cids = []
+            if self.x:
+                cids.append(ax.callbacks.connect('xlim_changed', self._on_lims_changed))
+            if self.y:
+                cids.append(ax.callbacks.connect('ylim_changed', self._on_lims_changed))
+            self._axes[ax] = cids
+            _group_of_axes[ax] = self
+
+    def remove(self, ax: 'Axes'):
+        cids = self._axes.pop(ax, None)
+        if cids is None:
+            return
+        for cid in cids:
+            ax.callbacks.disconnect(cid)
+        _group_of_axes.pop(ax, None)
+
+    def _on_lims_changed(self, ax: 'Axes'):
+        if self._syncing:
+            return  # a change made by `_apply_lims`
+        self._apply_lims(ax, [other for other in self.axes if other is not ax])
+
+    def _apply_lims(self, source: 'Axes', targets: List['Axes']):
+        from .windows import obtain_frame_scheduler
+
+        self._syncing = True
+        try:
+            canvases = {id(source.figure.canvas): source.figure.canvas}
+            for ax in targets:
+                changed = False
+                if self.x and ax.get_xlim() != source.get_xlim():
+                    ax.set_xlim(source.get_xlim())
+                    changed = True
+                if self.y and ax.get_ylim() != source.get_ylim():
+                    ax.set_ylim(source.get_ylim())
+                    changed = True
+                if changed:
+                    canvases[id(ax.figure.canvas)] = ax.figure.canvas
+        finally:
+            self._syncing = False
+
+        if len(canvases) > 1:
+            with obtain_frame_scheduler().batch():
+                for canvas in canvases.values():
+                    canvas.draw_idle()
+
+    def dump_membership(self) -> dict:
+        return dict(group=self.name, x=self.x, y=self.y)
+
+
+def obtain_link_group(name: str = None, x=True, y=False) -> LinkGroup:
+    """
+    Returns the link group with the given name; creates it if it does not exist.
+    :param name: `None` creates a new group with a unique name.
+    """
+    if name is None:
+        name = next(n for n in (f"link{i}" for i in _group_counter) if n not in link_groups)
+    group = link_groups.get(name)
+    if group is None:
+        group = LinkGroup(name, x, y)
+    return group
+
+
+def link_axes(*axes: 'Axes', name: str = None, x=True, y=False) -> LinkGroup:
+    """
+    Links limits of the axes (e.g. the time range of figures in different docks).
+    :param name: Name of the group; axes linked under the same name share limits.
+    :param x: Share x limits.
+    :param y: Share y limits.
+    """
+    group = obtain_link_group(name, x, y)
+    group.add(*axes)
+    return group
+
+
+def group_of(ax: 'Axes') -> Optional[LinkGroup]:
+    return _group_of_axes.get(ax)
@@ -0,0 +1,179 @@
+import logging
+from typing import List, Tuple
+
+import numpy as np
+from matplotlib.lines import Line2D
+
+MIN_LEVEL_SIZE = 1024  # coarser levels are not built
+BINS_PER_PIXEL = 4  # finer bins keep antialiased edges closer to the full-resolution line
+MIN_SAMPLES_PER_BIN = 4  # below that the line is shown at full resolution
+
+
+def minmax_levels(y: np.ndarray, min_level_size=MIN_LEVEL_SIZE) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Builds a min/max decimation pyramid of `y`.
+
+    Level `k` (starting from 1) consists of bins of `2 ** k` consecutive samples and is stored as two arrays: indexes of
+    the minimal and of the maximal sample in each bin. Every level is reduced from the previous one, so the whole
+    pyramid costs about as much as a single pass over the data.
+    """
+    index_type = np.int32 if len(y) < 2 ** 31 else np.int64
+    imin = imax = np.arange(len(y), dtype=index_type)
+    levels = []
+    while len(imin) > min_level_size:
+        even = len(imin) // 2 * 2
+        a_min, b_min = imin[0:even:2], imin[1:even:2]
+        a_max, b_max = imax[0:even:2], imax[1:even:2]
+        new_min = np.where(y[b_min] < y[a_min], b_min, a_min)
+        new_max = np.where(y[b_max] > y[a_max], b_max, a_max)
+        if len(imin) % 2:
+            new_min = np.append(new_min, imin[-1])
+            new_max = np.append(new_max, imax[-1])
+        imin, imax = new_min, new_max
+        levels.append((imin, imax))
+    return levels
+
+
+def minmax_indexes(imin: np.ndarray, imax: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    """
+    Returns indexes of the first, the extreme and the last samples of all bins, in the order they appear in the data.
+
+    Keeping the first and the last sample of each bin makes segments between bins identical to the original ones.
+    """
+    return np.column_stack([first, np.minimum(imin, imax), np.maximum(imin, imax), last]).ravel()
+
+
+class LodLine:
+    """
+    Level-of-detail mode of a line with many samples.
+
+    The full data is decimated once into a min/max pyramid. Whenever the x-limits or the canvas size change, the visible
+    samples are split into bins by x (`BINS_PER_PIXEL` per pixel column of the axes, so the samples need not be evenly
+    spaced) and the line is given the first, the minimal, the maximal and the last sample of every bin. The extremes of
+    a bin are exact; they are found from the pyramid levels that make up its range of samples. If a bin holds fewer than
+    `MIN_SAMPLES_PER_BIN` samples on average, all of them are shown.
+
+    The result is not identical to the full-resolution render, since the many overlapping segments of the full line add
+    up to a different antialiasing: a few percent of the pixels along the line differ, but every pixel drawn by one of
+    them lies within one pixel of the other (as does matplotlib's own path simplification).
+
+    The x-data must be sorted.
+    """
+
+    def __init__(self, line: Line2D, min_level_size=MIN_LEVEL_SIZE):
+        self.line = line
+        self.x = np.asarray(line.get_xdata(orig=True), dtype=float)
+        self.y = np.asarray(line.get_ydata(orig=True), dtype=float)
+        self.levels = []
+        self.decimated = False  # whether the line shows fewer samples than are visible
+
+        if len(self.x) > 1 and np.any(np.diff(self.x) < 0):
+            logging.warning("level of detail requires sorted x-data; showing full resolution")
+            return
+
+        self.levels = minmax_levels(self.y, min_level_size)
+        ax = line.axes
+        # callbacks are held strongly by the registries (unlike bound methods), which keeps this object alive
+        self._xlim_cid = ax.callbacks.connect('xlim_changed', lambda ax: self.update())
+        self._resize_cid = ax.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+        self.update()
+
+    def update(self):
+        ax = self.line.axes
+        if ax is None:
+            return
+        n = len(self.x)
+        starts, stops = self._bin_ranges(ax)
+        i0, i1 = starts[0], stops[-1]
+        self.decimated = i1 - i0 >= MIN_SAMPLES_PER_BIN * len(starts)
+        if not self.decimated:
+            idx = slice(max(i0 - 1, 0), min(i1 + 1, n))
+        else:
+            filled = stops > starts
+            starts, stops = starts[filled], stops[filled]
+            imin, imax = self._range_extremes(starts, stops)
+            # the samples just outside of the view keep the line entering and leaving it as the full one does
+            idx = np.concatenate([np.arange(max(i0 - 1, 0), i0), minmax_indexes(imin, imax, starts, stops - 1),
+                                  np.arange(i1, min(i1 + 1, n))])
+        self.line.set_data(self.x[idx], self.y[idx])
+
+    def _bin_ranges(self, ax) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the ranges of samples (starts and stops) lying in each bin of the axes width, from left to right.
+        """
+        x0, x1 = ax.bbox.x0, ax.bbox.x1
+        step = 1 / BINS_PER_PIXEL
+        edges = np.unique(np.concatenate([[x0], np.arange(np.floor(x0) + step, np.ceil(x1), step), [x1]]))
+        edges = edges[(edges >= x0) & (edges <= x1)]
+        data_edges = ax.transData.inverted().transform(np.column_stack([edges, np.full(len(edges), ax.bbox.y0)]))[:, 0]
+        if data_edges[0] > data_edges[-1]:
+            data_edges = data_edges[::-1]  # inverted axis; bins go from the smaller x then
+        bounds = np.searchsorted(self.x, data_edges)
+        bounds[-1] = np.searchsorted(self.x, data_edges[-1], side='right')  # samples at the right limit are visible
+        return bounds[:-1], bounds[1:]
+
+    def _range_extremes(self, starts: np.ndarray, stops: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns indexes of the minimal and the maximal sample in each of the (non-empty) ranges of samples.
+
+        Every range is split into aligned bins of the pyramid (at most two per level), whose extremes are compared.
+        """
+        y = self.y
+        best_min, best_max = starts.copy(), starts.copy()
+
+        def consider(take, candidate_min, candidate_max):
+            current = best_min[take]
+            best_min[take] = np.where(y[candidate_min] < y[current], candidate_min, current)
+            current = best_max[take]
+            best_max[take] = np.where(y[candidate_max] > y[current], candidate_max, current)
+
+        lo, hi = starts.copy(), stops.copy()  # bins of the current level still to be compared
+        for level in range(len(self.levels) + 1):
+            imin, imax = self.levels[level - 1] if level else (None, None)
+            take = (lo % 2 == 1) & (lo < hi)
+            bins = lo[take]
+            consider(take, bins if imin is None else imin[bins], bins if imax is None else imax[bins])
+            lo += take
+            take = (hi % 2 == 1) & (lo < hi)
+            hi -= take
+            bins = hi[take]
+            consider(take, bins if imin is None else imin[bins], bins if imax is None else imax[bins])
+            if level < len(self.levels):
+                lo >>= 1
+                hi >>= 1
+
+        # wide ranges still have whole bins of the coarsest level left
+        left = np.flatnonzero(lo < hi)
+        if len(left):
+            imin, imax = self.levels[-1] if self.levels else (np.arange(len(y)), np.arange(len(y)))
+            counts = hi[left] - lo[left]
+            first = np.cumsum(counts) - counts  # of each range among the candidates
+            range_index = np.repeat(np.arange(len(left)), counts)
+            bins = np.repeat(lo[left] - first, counts) + np.arange(counts.sum())
+            for extremes, sign, best in ((imin, 1, best_min), (imax, -1, best_max)):
+                candidates = extremes[bins]
+                # the first candidate of each range after sorting by the range and then by the value
+                order = np.lexsort((sign * y[candidates], range_index))
+                candidates = candidates[order][first]
+                current = best[left]
+                better = sign * y[candidates] < sign * y[current]
+                best[left] = np.where(better, candidates, current)
+        return best_min, best_max
+
+    def disconnect(self):
+        """
+        Turns the level of detail off and gives the line back its full data.
+        """
+        ax = self.line.axes
+        if self.levels and ax is not None:
+            ax.callbacks.disconnect(self._xlim_cid)
+            ax.figure.canvas.mpl_disconnect(self._resize_cid)
+        self.levels = []
+        self.line.set_data(self.x, self.y)
+
+
+def enable_lod(line: Line2D) -> LodLine:
+    """
+    Turns on the level-of-detail mode for `line`, which must already be added to axes.
+    """
+    return LodLine(line)
@@ -0,0 +1,137 @@
+"""
+Timings of the hot paths (rendering, layout, zooming, saving and restoring state, adding widgets) per dock.
+
+Records are kept in memory: aggregated statistics for every dock and operation, and a bounded list of the most recent
+spans, which can be exported as a Chrome trace (open it in `chrome://tracing` or https://ui.perfetto.dev).
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from PyQt5.QtWidgets import QWidget
+
+MAX_TRACE_EVENTS = 100000
+
+enabled = True
+_start = time.perf_counter()
+_stats = {}  # type: Dict[Tuple[str, str], OperationStats]
+_events = deque(maxlen=MAX_TRACE_EVENTS)  # (name, dock, start, duration, thread id)
+_lock = threading.Lock()
+
+
+class OperationStats:
+    __slots__ = ('count', 'total', 'max', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(count=self.count, total=self.total, mean=self.mean, max=self.max, last=self.last)
+
+
+def widget_name(widget: Optional['QWidget']) -> str:
+    """
+    Returns the name of the dock a widget belongs to (the first `objectName` found among the widget and its parents).
+    """
+    while widget is not None:
+        name = widget.objectName()
+        if name:
+            return name
+        widget = widget.parentWidget()
+    return ''
+
+
+def add_record(operation: str, dock: str, start: float, duration: float):
+    with _lock:
+        stats = _stats.get((dock, operation))
+        if stats is None:
+            stats = _stats[dock, operation] = OperationStats()
+        stats.count += 1
+        stats.total += duration
+        stats.max = max(stats.max, duration)
+        stats.last = duration
+        _events.append((operation, dock, start, duration, threading.get_ident()))
+
+
+class measure:
+    """
+    A context manager recording how long its body takes::
+
+        with perf.measure('draw', dock_name):
+            ...
+    """
+    __slots__ = ('operation', 'dock', 'start')
+
+    def __init__(self, operation: str, dock: str = ''):
+        self.operation = operation
+        self.dock = dock
+
+    def __enter__(self):
+        self.start = time.perf_counter() if enabled else None
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.start is not None:
+            add_record(self.operation, self.dock, self.start, time.perf_counter() - self.start)
+
+
+def stats(dock: str = None) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Returns `{dock: {operation: {'count', 'total', 'mean', 'max', 'last'}}}` (times in seconds).
+    :param dock: Return only the statistics of this dock.
+    """
+    result = {}
+    with _lock:
+        for (name, operation), operation_stats in _stats.items():
+            if dock is None or name == dock:
+                result.setdefault(name, {})[operation] = operation_stats.as_dict()
+    return result
+
+
+def slowest(count=10, operation='draw', key='mean') -> List[Tuple[str, Dict[str, float]]]:
+    """
+    Returns up to `count` docks with the slowest `operation` as `(dock, statistics)` pairs, the slowest first.
+    :param key: 'mean', 'max', 'last' or 'total'.
+    """
+    with _lock:
+        selected = [(dock, stats.as_dict()) for (dock, op), stats in _stats.items() if op == operation]
+    return sorted(selected, key=lambda item: item[1][key], reverse=True)[:count]
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _events.clear()
+
+
+def trace_events() -> List[Dict]:
+    """
+    Returns the recorded spans as complete ('X') events of the Chrome trace event format.
+    """
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    return [
+        dict(name=operation, cat='mpldock', ph='X', ts=(start - _start) * 1e6, dur=duration * 1e6, pid=pid, tid=tid,
+             args=dict(dock=dock))
+        for operation, dock, start, duration, tid in events
+    ]
+
+
+def export_trace(path: str):
+    """
+    Saves the recorded spans as a Chrome trace (JSON), e.g. to inspect a slow session offline.
+    """
+    with open(path, 'w') as f:
+        json.dump(dict(traceEvents=trace_events(), displayTimeUnit='ms'), f)
@@ -0,0 +1,80 @@
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QFileDialog, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+
+from mpldock import perf
+from mpldock.common import named
+
+PERFORMANCE_DOCK_NAME = 'mpldock_performance'
+REFRESH_INTERVAL_MS = 1000
+MAX_ROWS = 50
+
+COLUMNS = ('Dock', 'Operation', 'Count', 'Mean [ms]', 'Max [ms]', 'Last [ms]')
+
+
+class PerformanceWidget(QWidget):
+    """
+    Lists the slowest operations recorded by `mpldock.perf` (the slowest on average first) and allows exporting a trace.
+    """
+
+    def __init__(self):
+        super().__init__()
+        named(self, PERFORMANCE_DOCK_NAME, "Performance")
+
+        self.table = QTableWidget(0, len(COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+
+        reset_button = QPushButton("Reset", self)
+        reset_button.clicked.connect(self.reset)
+        export_button = QPushButton("Export trace...", self)
+        export_button.clicked.connect(self.export_trace)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(export_button)
+        buttons.addStretch()
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(REFRESH_INTERVAL_MS)
+        self._timer.timeout.connect(self.refresh)
+
+    def showEvent(self, a0):
+        self.refresh()
+        self._timer.start()
+
+    def hideEvent(self, a0):
+        self._timer.stop()
+
+    def refresh(self):
+        rows = [
+            (dock, operation, s)
+            for dock, operations in perf.stats().items() if dock != PERFORMANCE_DOCK_NAME
+            for operation, s in operations.items()
+        ]
+        rows.sort(key=lambda row: row[2]['mean'], reverse=True)
+        rows = rows[:MAX_ROWS]
+
+        self.table.setRowCount(len(rows))
+        for i, (dock, operation, s) in enumerate(rows):
+            values = dock, operation, str(s['count'])
+            values += tuple(f"{s[key] * 1000:.1f}" for key in ('mean', 'max', 'last'))
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if j >= 2:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(i, j, item)
+
+    def reset(self):
+        perf.reset()
+        self.refresh()
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export trace", "mpldock-trace.json", "Trace (*.json)")
+        if path:
+            perf.export_trace(path)
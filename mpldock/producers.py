@@ -0,0 +1,309 @@
+"""
+Producers: functions computing data in worker processes (so the GUI is not blocked by the GIL) and publishing NumPy
+arrays through shared memory, which are then shown by artists in docks.
+
+A producer is called as `func(publish, *args, **kwargs)` in a process of a pool started with the 'spawn' method (so
+`func` must be importable, i.e. defined at the top level of a module, and the script must guard its main code with
+`if __name__ == '__main__'`). Each call of `publish(key, array)` copies the array into a shared memory block, whose
+name is sent to the GUI; the GUI gives artists bound to `key` a view of the block, without pickling or copying. Every
+key has two blocks used alternately: `publish` waits until the GUI shows the previous array, so a block is never
+overwritten while it is being shown.
+"""
+import logging
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from matplotlib.artist import Artist
+from matplotlib.collections import Collection
+from matplotlib.lines import Line2D
+
+MAX_KEYS = 64  # per producer
+POLL_INTERVAL_MS = 10
+
+# control block of a producer: a stop flag followed by the last sequence number shown by the GUI for every key
+_STOP = 0
+
+_executor = None  # type: Optional[ProcessPoolExecutor]
+_executor_size = 0
+_executor_load = 0  # producers started in `_executor` and not done yet
+_manager = None
+
+
+def _obtain_executor() -> ProcessPoolExecutor:
+    global _executor, _executor_size, _executor_load
+    # producers run long, so every one of them takes a process; rather than queueing a producer, a full pool is replaced
+    # by one twice as large (the old one finishes the producers running in it)
+    if _executor is None or _executor_load >= _executor_size:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor_size = max(2 * _executor_size if _executor is not None else 0, os.cpu_count() or 1)
+        _executor_load = 0
+        # 'spawn' because forking a Qt process is unsafe
+        _executor = ProcessPoolExecutor(max_workers=_executor_size, mp_context=multiprocessing.get_context('spawn'))
+    _executor_load += 1
+    return _executor
+
+
+def _obtain_manager():
+    global _manager
+    if _manager is None:
+        _manager = multiprocessing.get_context('spawn').Manager()
+    return _manager
+
+
+class ProducerStopped(Exception):
+    """
+    Raised by `publish` when the producer is asked to stop (it ends the producer normally).
+    """
+
+
+class _Publisher:
+    """
+    The `publish` function given to a producer (runs in the worker process).
+    """
+
+    def __init__(self, control_name: str, queue):
+        self.control = SharedMemory(control_name)
+        self.flags = np.ndarray((1 + MAX_KEYS,), dtype=np.int64, buffer=self.control.buf)
+        self.queue = queue
+        self.keys = {}  # type: Dict[str, Tuple[int, List[Optional[SharedMemory]]]]  # slot and blocks
+        self.sequences = {}  # type: Dict[str, int]
+
+    def __call__(self, key: str, array: np.ndarray):
+        array = np.ascontiguousarray(array)
+        if key not in self.keys:
+            if len(self.keys) >= MAX_KEYS:
+                raise Exception(f"a producer may publish at most {MAX_KEYS} keys")
+            self.keys[key] = len(self.keys), [None, None]
+            self.sequences[key] = 0
+        slot, blocks = self.keys[key]
+        sequence = self.sequences[key] + 1
+
+        # the block was last used for `sequence - 2`; it's free once the GUI shows `sequence - 1` (from the other one)
+        while self.flags[1 + slot] < sequence - 1:
+            if self.flags[_STOP]:
+                raise ProducerStopped()
+            time.sleep(0.001)
+        if self.flags[_STOP]:
+            raise ProducerStopped()
+
+        block = blocks[sequence % 2]
+        if block is None or block.size < array.nbytes:
+            if block is not None:
+                block.close()
+                block.unlink()  # the GUI keeps its mapping until it gets the new block
+            block = blocks[sequence % 2] = SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        self.sequences[key] = sequence
+        self.queue.put((key, slot, sequence, block.name, array.shape, array.dtype.str))
+
+    def close(self):
+        del self.flags
+        self.control.close()
+        for slot, blocks in self.keys.values():
+            for block in blocks:
+                if block is not None:
+                    block.close()  # unlinked by the GUI, which may still be showing it
+
+
+def _run_producer(func: Callable, control_name: str, queue, args, kwargs):
+    publish = _Publisher(control_name, queue)
+    try:
+        func(publish, *args, **kwargs)
+    except ProducerStopped:
+        pass
+    except BaseException:
+        # the traceback is formatted here, since the exception itself may not be picklable
+        raise Exception(traceback.format_exc()) from None
+    finally:
+        publish.close()
+
+
+class Producer(QObject):
+    """
+    The GUI side of a producer started by `start_producer`.
+
+    Bind keys to artists (or callables) with `bind`. If the producer fails (raises or its process dies), the error is
+    logged and shown in the figures of the bound artists; the window keeps running.
+    """
+    finished = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    _done = pyqtSignal(Future)
+
+    def __init__(self, func: Callable, args=(), kwargs=None, name: str = None, executor: Executor = None):
+        super().__init__()
+        self.name = name or getattr(func, '__name__', 'producer')
+        self.error = None  # type: Optional[str]
+        self.bindings = {}  # type: Dict[str, List[Any]]
+        self._blocks = {}  # type: Dict[str, SharedMemory]  # by name
+        self._shown_blocks = {}  # type: Dict[Tuple[str, int], str]  # block name by key and buffer index
+        self._error_texts = []
+
+        self._control = SharedMemory(create=True, size=8 * (1 + MAX_KEYS))
+        self._flags = np.ndarray((1 + MAX_KEYS,), dtype=np.int64, buffer=self._control.buf)
+        self._flags[:] = 0
+        self._queue = _obtain_manager().Queue()
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(POLL_INTERVAL_MS)
+        self._timer.timeout.connect(self._poll)
+        self._timer.start()
+
+        self._done.connect(self._on_done)
+        self._executor = executor or _obtain_executor()
+        self.future = self._executor.submit(
+            _run_producer, func, self._control.name, self._queue, tuple(args), dict(kwargs or {})
+        )
+        self.future.add_done_callback(self._done.emit)
+
+    def bind(self, key: str, target):
+        """
+        Shows arrays published under `key` with `target`: a line (`set_ydata`, x is the sample index unless the line
+        already has as many x values), an image (`set_data`), a collection (`set_offsets`) or a callable taking the
+        array. The array is a view of shared memory valid until the next array of the key is shown; copy it to keep it.
+        """
+        self.bindings.setdefault(key, []).append(target)
+
+    def stop(self):
+        """
+        Asks the producer to stop; its next `publish` ends it.
+        """
+        self._flags[_STOP] = 1
+
+    @property
+    def running(self) -> bool:
+        return not self.future.done()
+
+    def _poll(self):
+        latest = {}
+        try:
+            while True:
+                message = self._queue.get_nowait()
+                latest[message[0]] = message
+        except Exception:
+            pass  # empty (or the manager is gone)
+
+        canvases = {}
+        for key, slot, sequence, block_name, shape, dtype in latest.values():
+            array = self._view(key, sequence, block_name, shape, dtype)
+            for target in self.bindings.get(key, []):
+                try:
+                    canvas = self._apply(target, array)
+                    if canvas is not None:
+                        canvases[id(canvas)] = canvas
+                except Exception:
+                    logging.exception(f"exception during showing '{key}' of producer '{self.name}'")
+            self._flags[1 + slot] = sequence
+        for canvas in canvases.values():
+            canvas.draw_idle()
+
+    def _view(self, key, sequence, block_name, shape, dtype) -> np.ndarray:
+        block = self._blocks.get(block_name)
+        if block is None:
+            block = self._blocks[block_name] = SharedMemory(block_name)
+            # a grown block replaces the old one of the same buffer; the producer already unlinked that one
+            old_name = self._shown_blocks.get((key, sequence % 2))
+            if old_name is not None:
+                self._release(old_name, unlink=False)
+            self._shown_blocks[key, sequence % 2] = block_name
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+    @staticmethod
+    def _apply(target, array: np.ndarray):
+        if isinstance(target, Artist):
+            if isinstance(target, (Line2D, Collection)):
+                if isinstance(target, Line2D):
+                    if len(target.get_xdata(orig=True)) != len(array):
+                        target.set_xdata(np.arange(len(array)))
+                    target.set_ydata(array)
+                else:
+                    target.set_offsets(array)
+                if target.axes is not None:
+                    target.axes.relim()
+                    target.axes.autoscale_view()
+            else:
+                target.set_data(array)  # e.g. an image
+            return target.figure.canvas if target.figure is not None else None
+        target(array)
+        return None
+
+    def _on_done(self, future: Future):
+        global _executor, _executor_load
+        self._poll()  # the last arrays
+        self._timer.stop()
+        if self._executor is _executor:
+            _executor_load -= 1
+        try:
+            future.result()
+            self.finished.emit()
+        except BrokenProcessPool:
+            if self._executor is _executor:
+                _executor = None  # a broken pool can't run anything more; the next producer starts a new one
+            self._fail(f"the process of producer '{self.name}' died")
+        except Exception as e:
+            self._fail(f"producer '{self.name}' failed:\n{e}")
+        self._release_all()
+
+    def _fail(self, message: str):
+        logging.error(message)
+        self.error = message
+        figures = {}
+        for targets in self.bindings.values():
+            for target in targets:
+                figure = getattr(target, 'figure', None)
+                if figure is not None:
+                    figures[id(figure)] = figure
+        for figure in figures.values():
+            self._error_texts.append(figure.text(
+                0.5, 0.5, message.strip().splitlines()[-1], color='red', ha='center', va='center', wrap=True,
+                bbox=dict(facecolor='white', edgecolor='red'),
+            ))
+            figure.canvas.draw_idle()
+        self.failed.emit(message)
+
+    def _release(self, block_name: str, unlink=True):
+        block = self._blocks.pop(block_name, None)
+        if block is None:
+            return
+        try:
+            block.close()
+        except BufferError:
+            pass  # still referenced by an artist; the mapping is freed with the last view
+        if unlink:
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _release_all(self):
+        for block_name in list(self._blocks):
+            self._release(block_name)
+        del self._flags
+        self._control.close()
+        self._control.unlink()
+
+
+def start_producer(func: Callable, *args, name: str = None, executor: Executor = None, **kwargs) -> Producer:
+    """
+    Runs `func(publish, *args, **kwargs)` in a worker process; see `mpldock.producers`.
+
+        def simulate(publish, steps):
+            for i in range(steps):
+                publish('state', heavy_computation(i))
+
+        producer = start_producer(simulate, 1000)
+        producer.bind('state', line)
+
+    :param name: A name used in messages (the name of `func` by default).
+    :param executor: A process pool to use instead of the shared one (producers beyond its size wait for a worker).
+    """
+    return Producer(func, args, kwargs, name=name, executor=executor)
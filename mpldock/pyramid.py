@@ -0,0 +1,194 @@
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from matplotlib import rcParams
+from matplotlib.axes import Axes
+
+TILE_SIZE = 256
+
+_executor = None  # type: Optional[ThreadPoolExecutor]
+
+
+def _obtain_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mpldock-pyramid')
+    return _executor
+
+
+def downsample(data: np.ndarray) -> np.ndarray:
+    """
+    Halves both image dimensions by averaging 2x2 blocks (an odd last row or column is dropped).
+    """
+    h, w = data.shape[0] // 2 * 2, data.shape[1] // 2 * 2
+    blocks = data[:h, :w].reshape(h // 2, 2, w // 2, 2, *data.shape[2:])
+    mean = blocks.mean(axis=(1, 3))
+    if np.issubdtype(data.dtype, np.integer):
+        mean = np.rint(mean)
+    return mean.astype(data.dtype, copy=False)
+
+
+class ImagePyramid(QObject):
+    """
+    Multi-resolution levels of an image. Level `k` is `2 ** k` times smaller than the image in each dimension.
+
+    A level is available immediately as a strided view of the image. If `smooth` is set, averaged levels are computed
+    in a background thread and replace the strided ones as they become ready (`level_ready` is emitted then, in the GUI
+    thread).
+    """
+    level_ready = pyqtSignal(int)
+
+    _level_computed = pyqtSignal(int, object)
+
+    def __init__(self, data: np.ndarray, smooth=True, min_size=TILE_SIZE):
+        super().__init__()
+        self.data = data
+        self.levels_count = 1
+        while max(data.shape[:2]) >> self.levels_count >= min_size:
+            self.levels_count += 1
+        self._smooth_levels = {0: data}  # type: Dict[int, np.ndarray]
+        self._level_computed.connect(self._on_level_computed, Qt.QueuedConnection)
+        self._future = None  # type: Optional[Future]
+        self._cancelled = False
+        if smooth and self.levels_count > 1:
+            self._future = _obtain_executor().submit(self._compute_smooth_levels)
+
+    def cancel(self):
+        """
+        Stops computing the averaged levels (those not computed yet stay strided).
+        """
+        self._cancelled = True
+        if self._future is not None:
+            self._future.cancel()
+
+    def level(self, k: int) -> np.ndarray:
+        smooth = self._smooth_levels.get(k)
+        if smooth is not None:
+            return smooth
+        step = 1 << k
+        return self.data[::step, ::step]
+
+    def _compute_smooth_levels(self):
+        try:
+            level = self.data
+            for k in range(1, self.levels_count):
+                if self._cancelled:
+                    return
+                level = downsample(level)
+                self._level_computed.emit(k, level)
+        except Exception:
+            logging.exception("exception during computing image pyramid")
+
+    def _on_level_computed(self, k: int, level: np.ndarray):
+        if self._cancelled:
+            return
+        self._smooth_levels[k] = level
+        self.level_ready.emit(k)
+
+
+class PyramidImage:
+    """
+    An image shown through an `ImagePyramid`.
+
+    Whenever the view changes, the image artist is given only the tiles of the level matching the resolution of the
+    visible part, so a zoomed-out view of a huge image costs about the same as of a screen-sized one.
+    """
+
+    def __init__(self, ax: Axes, data: np.ndarray, smooth=True, tile_size=TILE_SIZE, origin=None, **imshow_kwargs):
+        self.ax = ax
+        self.pyramid = ImagePyramid(data, smooth=smooth, min_size=tile_size)
+        self.tile_size = tile_size
+        self.origin = origin or rcParams['image.origin']
+        self.shape = data.shape[:2]
+        self._shown = None  # level and tile range currently given to the artist
+
+        h, w = self.shape
+        extent = (-0.5, w - 0.5, h - 0.5, -0.5) if self.origin == 'upper' else (-0.5, w - 0.5, -0.5, h - 0.5)
+        coarsest = self.pyramid.level(self.pyramid.levels_count - 1)
+        self.image = ax.imshow(coarsest, origin=self.origin, extent=extent, **imshow_kwargs)
+
+        self._xlim_cid = ax.callbacks.connect('xlim_changed', lambda ax: self.update())
+        self._ylim_cid = ax.callbacks.connect('ylim_changed', lambda ax: self.update())
+        self._resize_cid = ax.figure.canvas.mpl_connect('resize_event', lambda event: self.update())
+        self.pyramid.level_ready.connect(self._level_ready)
+        self._connected = True
+        self.update()
+
+    @property
+    def removed(self) -> bool:
+        return self.image.axes is None or self.ax.figure is None or self.ax not in self.ax.figure.axes
+
+    def disconnect(self):
+        """
+        Stops following the view (called also when the image or its axes turn out to be removed).
+        """
+        if not self._connected:
+            return
+        self._connected = False
+        self.ax.callbacks.disconnect(self._xlim_cid)
+        self.ax.callbacks.disconnect(self._ylim_cid)
+        if self.ax.figure is not None:
+            self.ax.figure.canvas.mpl_disconnect(self._resize_cid)
+        self.pyramid.level_ready.disconnect(self._level_ready)
+        self.pyramid.cancel()
+
+    def _level_ready(self, k):
+        if self.removed:
+            self.disconnect()
+            return
+        if self._shown is not None and self._shown[0] == k:
+            self.update(force=True)
+            self.ax.figure.canvas.draw_idle()
+
+    def update(self, force=False):
+        if self.removed:
+            self.disconnect()
+            return
+        h, w = self.shape
+        (x0, x1), (y0, y1) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        # visible range in image pixels
+        c0, c1 = np.clip([x0 + 0.5, x1 + 0.5], 0, w)
+        r0, r1 = np.clip([y0 + 0.5, y1 + 0.5], 0, h)
+        if c1 <= c0 or r1 <= r0:
+            return
+
+        pixels_per_screen_pixel = max((c1 - c0) / max(self.ax.bbox.width, 1),
+                                      (r1 - r0) / max(self.ax.bbox.height, 1))
+        k = int(np.clip(np.floor(np.log2(max(pixels_per_screen_pixel, 1))), 0, self.pyramid.levels_count - 1))
+        level = self.pyramid.level(k)
+        scale = 1 << k
+
+        t = self.tile_size
+        lh, lw = level.shape[:2]
+        tc0, tc1 = int(c0 // scale) // t * t, min(-(-int(np.ceil(c1 / scale)) // t) * t, lw)
+        tr0, tr1 = int(r0 // scale) // t * t, min(-(-int(np.ceil(r1 / scale)) // t) * t, lh)
+        shown = k, tc0, tc1, tr0, tr1
+        if shown == self._shown and not force:
+            return
+        self._shown = shown
+
+        left, right = tc0 * scale - 0.5, min(tc1 * scale, w) - 0.5
+        top, bottom = tr0 * scale - 0.5, min(tr1 * scale, h) - 0.5
+        self.image.set_data(level[tr0:tr1, tc0:tc1])
+        # the extent follows the view, so it must not move the view (data limits still cover the whole image)
+        autoscale = self.ax.get_autoscalex_on(), self.ax.get_autoscaley_on()
+        self.ax.set_autoscale_on(False)
+        try:
+            if self.origin == 'upper':
+                self.image.set_extent((left, right, bottom, top))
+            else:
+                self.image.set_extent((left, right, top, bottom))
+        finally:
+            self.ax.set_autoscalex_on(autoscale[0])
+            self.ax.set_autoscaley_on(autoscale[1])
+
+
+def pyramid_imshow(ax: Axes, data: np.ndarray, smooth=True, tile_size=TILE_SIZE, **imshow_kwargs) -> PyramidImage:
+    """
+    Like `ax.imshow(data)`, but suited for huge images: only the visible tiles of a matching resolution level are drawn.
+    :param smooth: Compute averaged levels in a background thread (otherwise levels are strided views of `data`).
+    """
+    return PyramidImage(ax, data, smooth=smooth, tile_size=tile_size, **imshow_kwargs)
@@ -0,0 +1,55 @@
+import os
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+RenderWorker = Union[str, Executor, None]
+
+_executors = {}  # type: Dict[str, Executor]
+
+
+def snapshot(figure) -> bytes:
+    """
+    Pickles a figure to be unpickled in another thread or process (e.g. by `render_snapshot`).
+    """
+    manager = figure.canvas.manager
+    try:
+        # without a manager the figure is not re-registered in pyplot when unpickled
+        figure.canvas.manager = None
+        return pickle.dumps(figure)
+    finally:
+        figure.canvas.manager = manager
+
+
+def render_snapshot(snapshot: bytes, dpi: float) -> np.ndarray:
+    """
+    Renders a pickled figure with Agg and returns the RGBA frame. Meant to be run in a worker thread or process.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = pickle.loads(snapshot)
+    canvas = FigureCanvasAgg(figure)
+    figure.set_dpi(dpi)  # pickling drops the device pixel ratio
+    canvas.draw()
+    return np.asarray(canvas.buffer_rgba())
+
+
+def obtain_executor(worker: RenderWorker) -> Optional[Executor]:
+    """
+    Returns an executor for `worker`: 'thread' or 'process' for a shared pool, an `Executor` or `None` (no worker).
+    """
+    if worker is None or isinstance(worker, Executor):
+        return worker
+    executor = _executors.get(worker)
+    if executor is None:
+        max_workers = min(4, os.cpu_count() or 1)
+        if worker == 'thread':
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='mpldock-render')
+        elif worker == 'process':
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            raise Exception(f"unknown render worker: {worker}")
+        _executors[worker] = executor
+    return executor
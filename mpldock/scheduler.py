@@ -0,0 +1,136 @@
+import logging
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QCursor
+from PyQt5.QtWidgets import QWidget
+
+MAX_FPS = 60
+FRAME_BUDGET = 0.012  # seconds of rendering per frame; the rest of the frame is left for input handling
+
+
+class FrameScheduler(QObject):
+    """
+    Renders canvases of all windows in frames instead of separately for each `draw_idle`.
+
+    Requests are collected until the next frame (at most `max_fps` frames per second). In a frame, canvases that have
+    the keyboard focus or are under the cursor are rendered first, then the others in the order of requests, until the
+    frame takes `frame_budget` seconds. Canvases that didn't fit are rendered in the next frame(s), so input events are
+    handled in between even if a lot of figures are updated at once. Each frame of waiting raises the priority of a
+    canvas by one level, so the focused one can't starve the rest. Canvases requested together in a `batch` are
+    rendered in the same frame.
+    """
+
+    frame_rendered = pyqtSignal()
+
+    def __init__(self, max_fps=MAX_FPS, frame_budget=FRAME_BUDGET):
+        super().__init__()
+        self.frame_budget = frame_budget
+        self.frames = 0  # number of frames rendered so far
+        self.renders = 0  # number of canvas renders so far
+        # canvas and the frame it was requested in, in the order of requests
+        self._dirty = {}  # type: Dict[int, Tuple[weakref.ref, int]]
+        self._batch = None  # type: Optional[Set[int]]  # canvases requested in the current `batch`
+        self._batches = {}  # type: Dict[int, Set[int]]  # canvases to be rendered in the same frame as the key one
+        self._last_frame = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._render_frame)
+        self.max_fps = max_fps
+
+    @property
+    def max_fps(self) -> float:
+        return self._max_fps
+
+    @max_fps.setter
+    def max_fps(self, fps: float):
+        self._max_fps = fps
+        self._interval = 1.0 / fps if fps else 0.0
+
+    def request(self, canvas: QWidget):
+        """
+        Marks the canvas as needing a render (its `draw` is called in one of next frames).
+        """
+        self._dirty.setdefault(id(canvas), (weakref.ref(canvas), self.frames))
+        if self._batch is not None:
+            self._batch.add(id(canvas))
+        if not self._timer.isActive():
+            delay = self._last_frame + self._interval - time.perf_counter()
+            self._timer.start(max(int(delay * 1000), 0))
+
+    @contextmanager
+    def batch(self):
+        """
+        Canvases requested within this context are rendered in the same frame, even if it takes over the frame budget
+        (e.g. linked figures, which should never show different ranges).
+        """
+        if self._batch is not None:
+            yield  # nested; the outer batch includes these requests
+            return
+        self._batch = members = set()
+        try:
+            yield
+        finally:
+            self._batch = None
+            for key in members:
+                self._batches[key] = members
+
+    def cancel(self, canvas: QWidget):
+        self._dirty.pop(id(canvas), None)
+        self._batches.pop(id(canvas), None)
+
+    def has_pending(self) -> bool:
+        return bool(self._dirty)
+
+    def is_pending(self, canvas: QWidget) -> bool:
+        return id(canvas) in self._dirty
+
+    @staticmethod
+    def _priority(canvas: QWidget) -> int:
+        if canvas.hasFocus():
+            return 0
+        if canvas.rect().contains(canvas.mapFromGlobal(QCursor.pos())) and canvas.window().isActiveWindow():
+            return 1
+        return 2
+
+    def _dirty_canvases(self) -> List[QWidget]:
+        canvases = []
+        for key, (ref, frame) in list(self._dirty.items()):
+            canvas = ref()
+            if canvas is None or sip.isdeleted(canvas):
+                del self._dirty[key]
+                self._batches.pop(key, None)
+            else:
+                canvases.append((self._priority(canvas) - (self.frames - frame), canvas))
+        # sorting is stable, so canvases of the same priority keep the order of requests
+        return [canvas for priority, canvas in sorted(canvases, key=lambda item: item[0])]
+
+    def _render_frame(self):
+        start = self._last_frame = time.perf_counter()
+        forced = set()  # batched with a canvas rendered in this frame
+        rendered = False
+        for canvas in self._dirty_canvases():
+            key = id(canvas)
+            # at least one canvas is rendered in every frame
+            if rendered and key not in forced and time.perf_counter() - start > self.frame_budget:
+                continue
+            rendered = True
+            forced |= self._batches.pop(key, set())
+            # removed before rendering, so a render requested during drawing is not lost
+            self._dirty.pop(key, None)
+            if canvas.width() <= 0 or canvas.height() <= 0:
+                continue
+            try:
+                canvas.draw()
+            except Exception:
+                logging.exception("exception during rendering a figure")
+            self.renders += 1
+        self.frames += 1
+        self.frame_rendered.emit()
+
+        if self._dirty:
+            self._timer.start(max(int(self._interval * 1000), 0))
@@ -0,0 +1,144 @@
+"""
+A long-lived mpldock process owning windows and their persisted layout, showing figures sent by scripts using the
+`module://mpldock.client` backend:
+
+    mpldock-server [--name NAME] [--layout-id ID]
+
+Messages come over a local socket (see `client.encode_message`) readable only by the current user, since they are
+unpickled. A figure replaces the dock of the same name in place (keeping its view), so re-running a script updates its
+plots in the arranged layout.
+"""
+import argparse
+import logging
+import pickle
+import sys
+from typing import Dict
+
+from PyQt5.QtCore import QObject, QRectF, Qt
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from PyQt5.QtWidgets import QWidget
+
+from .client import HEADER, SERVER_NAME, server_address
+from .common import named
+from .windows import persist_layout, window
+
+LAYOUT_ID = 'mpldock-server'
+CONNECT_TIMEOUT_MS = 200
+
+
+class FrameView(QWidget):
+    """
+    Shows a frame rendered by a client (for figures that cannot be pickled), scaled to fit.
+    """
+
+    def __init__(self, png: bytes):
+        super().__init__()
+        self.image = QImage.fromData(png)
+        self.setMinimumSize(200, 200)
+
+    def paintEvent(self, event):
+        if self.image.isNull():
+            return
+        painter = QPainter(self)
+        try:
+            size = self.image.size().scaled(self.size(), Qt.KeepAspectRatio)
+            painter.drawImage(QRectF((self.width() - size.width()) / 2, (self.height() - size.height()) / 2,
+                                     size.width(), size.height()), self.image)
+        finally:
+            painter.end()
+
+
+class Server(QObject):
+    def __init__(self, name: str = SERVER_NAME, parent: QObject = None):
+        super().__init__(parent)
+        self.address = server_address(name)
+        self._buffers = {}  # type: Dict[QLocalSocket, bytearray]
+
+        probe = QLocalSocket()
+        probe.connectToServer(self.address)
+        if probe.waitForConnected(CONNECT_TIMEOUT_MS):
+            probe.abort()
+            raise Exception(f"an mpldock server is already listening on {self.address}")
+        QLocalServer.removeServer(self.address)  # a socket left by a server that crashed
+
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        if not self._server.listen(self.address):
+            raise Exception(f"cannot listen on {self.address}: {self._server.errorString()}")
+        self._server.newConnection.connect(self._on_new_connection)
+
+    def close(self):
+        self._server.close()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            connection = self._server.nextPendingConnection()
+            self._buffers[connection] = bytearray()
+            connection.readyRead.connect(lambda connection=connection: self._on_ready_read(connection))
+            connection.disconnected.connect(lambda connection=connection: self._on_disconnected(connection))
+
+    def _on_ready_read(self, connection: QLocalSocket):
+        buffer = self._buffers.get(connection)
+        if buffer is None:
+            return
+        buffer += bytes(connection.readAll())
+        while len(buffer) >= HEADER.size:
+            length, = HEADER.unpack_from(buffer)
+            if len(buffer) < HEADER.size + length:
+                break
+            data = bytes(buffer[HEADER.size:HEADER.size + length])
+            del buffer[:HEADER.size + length]
+            try:
+                self.handle(pickle.loads(data))
+            except Exception:
+                logging.exception("exception during handling a message of a client")
+
+    def _on_disconnected(self, connection: QLocalSocket):
+        self._on_ready_read(connection)  # the rest of the data
+        self._buffers.pop(connection, None)
+        connection.deleteLater()
+
+    def handle(self, message: dict):
+        kind = message['kind']
+        if kind == 'figure':
+            self.show_figure(message['name'], pickle.loads(message['figure']), message['title'])
+        elif kind == 'frame':
+            win = window()
+            win.replace(named(FrameView(message['frame']), message['name'], message['title']))
+            win.show()
+        else:
+            logging.warning(f"unknown message: {kind}")
+
+    @staticmethod
+    def show_figure(name: str, figure, title: str):
+        from .backend import FigureCanvas
+        from .figure import MplFigure
+
+        widget = named(MplFigure(FigureCanvas(figure)), name, title)
+        win = window()
+        win.replace(widget, widget.dump_state, widget.restore_state)
+        widget.track_dock_visibility()
+        win.show()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Show figures sent by scripts using the mpldock.client backend.")
+    parser.add_argument('--name', default=SERVER_NAME, help="name of the server (clients connect by it)")
+    parser.add_argument('--layout-id', default=LAYOUT_ID, help="id of the persisted layout")
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+    persist_layout(args.layout_id)
+    win = window()
+    try:
+        server = Server(args.name, win)
+    except Exception as e:
+        logging.error(str(e))
+        return 1
+    logging.info(f"listening on {server.address}")
+    return win.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,38 +1,175 @@
 import json
 import logging
 import os
-from typing import Dict, NamedTuple
-
-import appdirs
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Set, Union
 
+from . import indexedstate
 from .common import DumpStateFunction, DumpedState, RestoreStateFunction
 
+if TYPE_CHECKING:
+    from PyQt5.QtCore import QTimer
+
 APPNAME = 'mpldock'
 
+AUTOSAVE_INTERVAL = 10.0  # seconds
+
+# encoders return `str` or `bytes`, decoders take `bytes`
 encoders = dict(
     json=json.dumps,
+    mpldock=indexedstate.encode,
 )
 
 decoders = dict(
     json=json.loads,
+    mpldock=indexedstate.decode,
 )
 
 
+def write_atomic(path: str, data: Union[str, bytes]):
+    """
+    Writes `data` to a temporary file next to `path` and renames it, so `path` is never left truncated.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_state(path: str) -> DumpedState:
+    """
+    Reads a state file in the format given by its extension.
+    """
+    *_, ext = path.rpartition('.')
+    decode = decoders.get(ext)
+    if not decode:
+        raise Exception(f"unknown format: {ext}")
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
 class Client(NamedTuple):
     dump_state: DumpStateFunction
     restore_state: RestoreStateFunction
+    # dumps only what changed since the previous dump (used by autosave)
+    dump_changed_state: Optional[DumpStateFunction] = None
 
 
 class StateManager:
-    def __init__(self, id, factory_default_path):
+    def __init__(self, id, factory_default_path, state_format='json'):
+        """
+        :param state_format: Format of the files saved in the user data directory (a key of `encoders`).
+        """
         self._factory_default_path = factory_default_path
         self._id = id
+        self._state_format = state_format
 
         self._clients_by_name: Dict[str, Client] = {}
         self._restored_clients_state: Dict[str, DumpedState] = {}
 
-    def add_client(self, name, dump_state: DumpStateFunction, restore_state: RestoreStateFunction):
-        self._clients_by_name[name] = Client(dump_state=dump_state, restore_state=restore_state)
+        self._dirty_clients: Set[str] = set()
+        self._saved_clients_state: Dict[str, DumpedState] = {}  # states dumped since restoring
+        self._autosave_interval: Optional[float] = None
+        self._autosave_path: Optional[str] = None
+        self._autosave_timer: Optional['QTimer'] = None
+        self._autosave_executor: Optional[ThreadPoolExecutor] = None
+        self._autosave_future: Optional[Future] = None
+
+    def add_client(self, name, dump_state: DumpStateFunction, restore_state: RestoreStateFunction,
+                   dump_changed_state: DumpStateFunction = None):
+        """
+        :param dump_changed_state: Like `dump_state`, but may reuse unchanged parts of the previous dump (for autosave).
+        """
+        self._clients_by_name[name] = Client(dump_state=dump_state, restore_state=restore_state,
+                                             dump_changed_state=dump_changed_state)
+        self.mark_dirty(name)
+        if self._autosave_interval is not None and self._autosave_timer is None:
+            # clients are created with the qt application running, so it is a good moment to start the timer
+            self._start_autosave_timer()
+
+    def mark_dirty(self, name):
+        """
+        Tells that the state of the client `name` has changed and should be saved by the next autosave.
+        """
+        self._dirty_clients.add(name)
+
+    def enable_autosave(self, interval: float = AUTOSAVE_INTERVAL, path: str = None):
+        """
+        Periodically saves the state of clients that changed since the last save.
+
+        Only dirty clients are dumped (on the GUI thread); their state is merged with the last known state of the
+        others, then encoded and written atomically in a background thread.
+        :param interval: Seconds between saves.
+        :param path: A file to save to; by default it's the one used by `save_as_last`.
+        """
+        if path is None:
+            assert self._id, "autosave needs either a path or a layout id"
+            path = self._system_state_path(self._id)
+        self._autosave_interval = interval
+        self._autosave_path = path
+        if self._autosave_executor is None:
+            self._autosave_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mpldock-autosave')
+        if self._autosave_timer is not None:
+            self._autosave_timer.setInterval(int(interval * 1000))
+        elif self._clients_by_name:
+            self._start_autosave_timer()
+
+    def disable_autosave(self):
+        self._autosave_interval = None
+        if self._autosave_timer is not None:
+            self._autosave_timer.stop()
+            self._autosave_timer = None
+
+    def _start_autosave_timer(self):
+        from PyQt5.QtCore import QTimer
+
+        self._autosave_timer = QTimer()
+        self._autosave_timer.setInterval(int(self._autosave_interval * 1000))
+        self._autosave_timer.timeout.connect(self.autosave)
+        self._autosave_timer.start()
+
+    def autosave(self):
+        if not self._dirty_clients or self._autosave_path is None:
+            return
+        if self._autosave_future is not None and not self._autosave_future.done():
+            return  # the previous save is still being written; the dirty clients will wait for the next one
+
+        dirty_clients = self._dirty_clients
+        self._dirty_clients = set()
+        for name in dirty_clients:
+            client = self._clients_by_name.get(name)
+            if client is None:
+                continue
+            try:
+                self._saved_clients_state[name] = (client.dump_changed_state or client.dump_state)()
+            except Exception:
+                logging.exception(f"Exception during dumping state of '{name}'")
+
+        state = dict(clients=self._known_clients_state())
+        self._autosave_future = self._autosave_executor.submit(self._write_state, self._autosave_path, state)
+
+    @staticmethod
+    def _write_state(path: str, state: DumpedState):
+        try:
+            write_atomic(path, StateManager._encoder(path)(state))
+        except Exception:
+            logging.exception(f"Exception during autosaving state to '{path}'")
+
+    def _wait_for_autosave(self):
+        if self._autosave_future is not None:
+            self._autosave_future.result()
 
     def get_client_state(self, name):
         return self._restored_clients_state.get(name)
@@ -43,14 +180,32 @@ class StateManager:
             try:
                 clients[name] = client.dump_state()
             except Exception:
-                logging.exception("Exception during dumping state of '{name}'")
-        return dict(clients=clients)
+                logging.exception(f"Exception during dumping state of '{name}'")
+        self._saved_clients_state.update(clients)
+        self._dirty_clients.clear()
+        return dict(clients=self._known_clients_state())
 
-    def save_to_file(self, path: str):
+    def _known_clients_state(self):
+        # clients that are not present now (e.g. windows not created in this run) keep their restored state
+        clients = {
+            name: indexedstate.materialize(state)
+            for name, state in self._restored_clients_state.items()
+            if name not in self._saved_clients_state
+        }
+        clients.update(self._saved_clients_state)
+        return clients
+
+    @staticmethod
+    def _encoder(path: str):
         *_, ext = path.rpartition('.')
         encode = encoders.get(ext)
         if not encode:
             raise Exception(f"unknown format: {ext}")
+        return encode
+
+    def save_to_file(self, path: str):
+        encode = self._encoder(path)
+        self._wait_for_autosave()  # an older autosave must not overwrite this one
 
         state = self._dump_state()
 
@@ -58,37 +213,36 @@ class StateManager:
             encoded = encode(state)
         except Exception:
             logging.exception("Exception during endoding state")
+            return
 
         # we encode before opening a file to be safe if exception is raised during encoding
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w') as f:
-            f.write(encoded)
+        write_atomic(path, encoded)
 
     def _restore_state(self, state: DumpedState):
         clients_state = state['clients']
-        self._restored_clients_state = clients_state
+        self._restored_clients_state = clients_state  # may be decoded lazily, see `indexedstate`
+        self._saved_clients_state = {}
         for name, client in self._clients_by_name.items():
             client_state = clients_state.get(name)
             if client_state is not None:
                 try:
                     client.restore_state(client_state)
                 except Exception:
-                    logging.exception("Exception during restoring state of '{name}'")
+                    logging.exception(f"Exception during restoring state of '{name}'")
 
     def restore_from_file(self, path):
-        *_, ext = path.rpartition('.')
-        decode = decoders.get(ext)
-        if not decode:
-            raise Exception(f"unknown format: {ext}")
-        with open(path, 'r') as f:
-            state = decode(f.read())
-        self._restore_state(state)
+        self._restore_state(read_state(path))
+
+    def _system_state_path(self, id, state_format=None):
+        import appdirs
 
-    def _system_state_path(self, id):
-        return os.path.join(appdirs.user_data_dir(APPNAME, False), f"{id}.state.json")
+        return os.path.join(appdirs.user_data_dir(APPNAME, False), f"{id}.state.{state_format or self._state_format}")
 
     def restore_from_system(self, id):
         path = self._system_state_path(id)
+        if not os.path.exists(path):
+            # a layout saved before switching the format
+            path = self._system_state_path(id, 'json')
         if os.path.exists(path):
             try:
                 self.restore_from_file(path)
@@ -0,0 +1,122 @@
+from typing import Optional
+
+import numpy as np
+from PyQt5.QtCore import QTimer
+from matplotlib.axes import Axes
+
+MAX_FPS = 30
+
+
+class RingBuffer:
+    """
+    A fixed-capacity buffer of rows. Every row is stored twice (at `i` and at `i + capacity`), so the most recent rows
+    are always available as one contiguous view, without copying.
+    """
+
+    def __init__(self, capacity: int, width: int = 1, dtype=float):
+        assert capacity > 0
+        self.capacity = capacity
+        self._data = np.zeros((2 * capacity, width), dtype=dtype)
+        self._end = 0  # where the next row goes, in [0, capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, rows):
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, self._data.shape[1])
+        rows = rows[-self.capacity:]
+        idx = (self._end + np.arange(len(rows))) % self.capacity
+        self._data[idx] = rows
+        self._data[idx + self.capacity] = rows
+        self._end = (self._end + len(rows)) % self.capacity
+        self._size = min(self._size + len(rows), self.capacity)
+
+    def clear(self):
+        self._end = 0
+        self._size = 0
+
+    def view(self) -> np.ndarray:
+        """
+        Returns the stored rows, oldest first. The view is valid until the next `append`.
+        """
+        start = (self._end - self._size) % self.capacity
+        return self._data[start:start + self._size]
+
+
+class StreamingLine:
+    """
+    A line that keeps only the last `capacity` samples and is meant to be fed with new samples as they come.
+
+    Appending is cheap: samples go to a ring buffer and the line is refreshed (and the figure redrawn) at most `max_fps`
+    times per second. If `x_window` is given, the x-axis slides to show only that range of the most recent samples.
+    The line is an ordinary artist in `ax`, so when `ax` belongs to a docked figure its state is persisted as usual.
+    """
+
+    def __init__(self, ax: Axes, capacity: int, x_window: Optional[float] = None, max_fps: float = MAX_FPS,
+                 **line_kwargs):
+        self.ax = ax
+        self.x_window = x_window
+        self.buffer = RingBuffer(capacity, width=2)
+        self.line, = ax.plot([], [], **line_kwargs)
+
+        self._next_x = 0
+        self._dirty = False
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(int(1000 / max_fps))
+        self._timer.timeout.connect(self.refresh)
+
+    def append(self, y, x=None):
+        """
+        Appends samples. If `x` is not given, samples are numbered consecutively.
+        """
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        if x is None:
+            x = np.arange(self._next_x, self._next_x + len(y))
+        else:
+            x = np.atleast_1d(np.asarray(x, dtype=float))
+        if not len(y):
+            return
+        self._next_x = x[-1] + 1
+        self.buffer.append(np.column_stack([x, y]))
+        self._dirty = True
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def clear(self):
+        self.buffer.clear()
+        self._next_x = 0
+        self._dirty = True
+        self.refresh()
+
+    def refresh(self):
+        """
+        Pushes buffered samples to the line and requests a redraw. Called automatically after `append`.
+        """
+        if not self._dirty:
+            return
+        self._dirty = False
+        data = self.buffer.view()
+        self.line.set_data(data[:, 0], data[:, 1])
+        if self.x_window is not None and len(data):
+            last_x = data[-1, 0]
+            self.ax.set_xlim(last_x - self.x_window, last_x)
+        # axes that were zoomed or restored by the user have autoscaling turned off and are left alone
+        self.ax.relim()
+        self.ax.autoscale_view(scalex=self.x_window is None)
+        self.ax.figure.canvas.draw_idle()
+
+
+def streaming_line(figure_name: str, capacity: int, x_window: Optional[float] = None, max_fps: float = MAX_FPS,
+                   **line_kwargs) -> StreamingLine:
+    """
+    Creates a streaming line in the pyplot figure `figure_name` (docked when the mpldock backend is used).
+    :param figure_name: A figure label, as in `plt.figure(figure_name)`.
+    :param capacity: Maximal number of samples kept.
+    :param x_window: Width of the visible x-range following the newest sample (`None` to show all samples).
+    :param max_fps: Maximal number of refreshes per second.
+    """
+    import matplotlib.pyplot as plt
+
+    return StreamingLine(plt.figure(figure_name).gca(), capacity, x_window=x_window, max_fps=max_fps, **line_kwargs)
@@ -1,15 +1,29 @@
 import logging
 import signal
-from typing import Dict, NamedTuple, Callable
+from collections import ChainMap
+from concurrent.futures import Executor, Future
+from typing import (TYPE_CHECKING, Awaitable, Callable, Dict, Iterable, MutableMapping, NamedTuple, Optional, Set,
+                    Tuple, Union)
 
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QCloseEvent
+from PyQt5.QtCore import QEvent, Qt, QTimer, pyqtSignal
+from PyQt5.QtGui import QCloseEvent, QMoveEvent, QResizeEvent
 from PyQt5.QtWidgets import QApplication, QDockWidget, QMainWindow, QMenu, QWidget
 
+from mpldock import perf
 from mpldock.common import DumpStateFunction, RestoreStateFunction
 from .common import DumpedState, named
+from .perfwidget import PERFORMANCE_DOCK_NAME, PerformanceWidget
 from .statemanager import StateManager
 
+if TYPE_CHECKING:  # matplotlib is imported only when a lazily built figure is attached
+    from matplotlib.figure import Figure
+
+WidgetBuilder = Callable[[], Union[QWidget, 'Figure']]
+
+
+def _ignore_state(state: DumpedState):
+    pass
+
 
 class WidgetInfo(NamedTuple):
     widget: QWidget
@@ -17,11 +31,13 @@ class WidgetInfo(NamedTuple):
     title: str
     dock_widget: QDockWidget
     dump_state: DumpStateFunction = lambda: dict()
-    restore_state: RestoreStateFunction = lambda s: None
+    restore_state: RestoreStateFunction = _ignore_state
     remove_action: Callable = None
 
 
 class Window(QMainWindow):
+    _lazy_widget_built = pyqtSignal(str, Future)
+
     def __init__(self, parent, title, name, state_manager: StateManager):
         """
         :param parent:
@@ -69,13 +85,24 @@ class Window(QMainWindow):
         self.remove_menu = QMenu("&Remove widget", self)
         self.menuBar().addMenu(self.remove_menu)
 
+        self.view_menu = QMenu("&View", self)
+        self.menuBar().addMenu(self.view_menu)
+        self.performance_action = self.view_menu.addAction("&Performance")
+        self.performance_action.setCheckable(True)
+        self.performance_action.triggered.connect(self.toggle_performance_dock)
+
         self.close_callback = None
 
         self.resize(400, 400)  # workaround some bugs
 
         self.loaded_widgets_state = dict()
+        self._dumped_widgets_state = {}  # type: Dict[str, DumpedState]  # the last dumped, see `dump_changed_state`
+        self._dirty_widgets = set()  # type: Set[str]
+        self._lazy_builders = {}  # type: Dict[str, Tuple[WidgetBuilder, Optional[Executor], Callable]]
+        self._lazy_widget_built.connect(self._on_lazy_widget_built)
 
-        self.state_manager.add_client(self.name, self.dump_state, self.restore_state)
+        self.state_manager.add_client(self.name, self.dump_state, self.restore_state,
+                                      dump_changed_state=self.dump_changed_state)
         loaded_state = self.state_manager.get_client_state(self.name)
         if loaded_state is not None:
             self.restore_state(loaded_state)
@@ -84,9 +111,57 @@ class Window(QMainWindow):
         wi = self.widgets[widget_name]
         self.remove_menu.removeAction(wi.remove_action)
         self.removeDockWidget(wi.dock_widget)
-        wi.widget.destroy()
-        wi.dock_widget.destroy()
+        self._discard(wi.widget)
+        wi.dock_widget.deleteLater()
         del self.widgets[widget_name]
+        self._dumped_widgets_state.pop(widget_name, None)
+        self._dirty_widgets.discard(widget_name)
+        self.performance_action.setChecked(PERFORMANCE_DOCK_NAME in self.widgets)
+        self.mark_dirty()
+
+    def toggle_performance_dock(self, show: bool = None):
+        """
+        Shows or hides a dock listing the slowest figures (see `mpldock.perf`).
+        :param show: `None` toggles.
+        """
+        shown = PERFORMANCE_DOCK_NAME in self.widgets
+        if show is None:
+            show = not shown
+        if show and not shown:
+            self.add(PerformanceWidget())
+        elif not show and shown:
+            self.remove_widget(PERFORMANCE_DOCK_NAME)
+
+    def mark_dirty(self, *args):
+        """
+        Tells the state manager that the layout or a widget state has changed (used by autosave).
+        """
+        self.state_manager.mark_dirty(self.name)
+
+    def mark_widget_dirty(self, name: str):
+        """
+        Tells that the state of a widget has changed, so it is dumped again by `dump_changed_state`.
+        """
+        self._dirty_widgets.add(name)
+        self.mark_dirty()
+
+    def moveEvent(self, a0: QMoveEvent):
+        super().moveEvent(a0)
+        self.mark_dirty()
+
+    def resizeEvent(self, a0: QResizeEvent):
+        super().resizeEvent(a0)
+        self.mark_dirty()
+
+    def event(self, event: QEvent) -> bool:
+        result = super().event(event)
+        if event.type() == QEvent.MouseButtonRelease:
+            # a separator between docks was dragged; figures are rendered at their final size now instead of after
+            # their resize preview times out (see `backend.FigureCanvas.resize_preview`)
+            for widget in self.findChildren(QWidget):
+                if getattr(widget, 'resizing', False):
+                    widget.finish_resize()
+        return result
 
     def closeEvent(self, a0: QCloseEvent):
         self.state_manager.save_as_last()
@@ -94,13 +169,31 @@ class Window(QMainWindow):
             self.close_callback()
 
     def dump_state(self):
-        widgets_state = {}
-        for i in self.widgets.values():
+        return self._dump_state(self.widgets)
+
+    def dump_changed_state(self):
+        """
+        Like `dump_state`, but only widgets whose state changed since they were dumped (or that don't announce their
+        changes by a `state_changed` signal) are dumped again; the others keep their last dumped state (used by
+        autosave).
+        """
+        return self._dump_state(name for name, i in self.widgets.items()
+                                if name in self._dirty_widgets or name not in self._dumped_widgets_state
+                                or getattr(i.widget, 'state_changed', None) is None)
+
+    def _dump_state(self, names: Iterable[str]):
+        for name in list(names):
+            i = self.widgets[name]
+            self._dirty_widgets.discard(name)
             try:
-                widgets_state[i.name] = i.title, i.dump_state()
+                with perf.measure('dump_state', name):
+                    self._dumped_widgets_state[name] = i.dump_state()
             except Exception:
+                self._dumped_widgets_state.pop(name, None)
                 logging.exception("ignoring exception during serialization of {}".format(i.dock_widget.windowTitle()))
 
+        widgets_state = {name: (i.title, self._dumped_widgets_state[name]) for name, i in self.widgets.items()
+                         if name in self._dumped_widgets_state}
         return dict(
             geometry=bytes(self.saveGeometry()).hex(), state=bytes(self.saveState()).hex(), widgets=widgets_state
         )
@@ -110,15 +203,20 @@ class Window(QMainWindow):
             self.loaded_state = window_state
             self.loaded_widgets_state = window_state["widgets"]
 
-            for widget_name, (widget_title, widget_state) in self.loaded_widgets_state.items():
-                if widget_name not in self.widgets:
+            # entries are (title, state) pairs; states may be decoded lazily, so they are accessed only when needed
+            for widget_name, widget_entry in self.loaded_widgets_state.items():
+                if widget_name == PERFORMANCE_DOCK_NAME:
+                    self.toggle_performance_dock(True)
+                elif widget_name not in self.widgets:
                     # widget.show()
-                    self.add(named(QWidget(), widget_name, widget_title))
+                    self.add(named(QWidget(), widget_name, widget_entry[0]))
                 else:
-                    self.widgets[widget_name].restore_state(widget_state)
+                    with perf.measure('restore_state', widget_name):
+                        self.widgets[widget_name].restore_state(widget_entry[1])
 
             self.restoreGeometry(bytes.fromhex(window_state["geometry"]))
             self.restoreState(bytes.fromhex(window_state["state"]))
+            self._dirty_widgets.update(self.widgets)
         except Exception:
             logging.exception("exception during reading state file; ignoring")
 
@@ -127,8 +225,12 @@ class Window(QMainWindow):
         self,
         widget: QWidget,
         dump_state: DumpStateFunction = lambda: dict(),
-        restore_state: RestoreStateFunction = lambda b: None,
+        restore_state: RestoreStateFunction = _ignore_state,
     ):
+        with perf.measure('add', widget.objectName()):
+            self._add(widget, dump_state, restore_state)
+
+    def _add(self, widget: QWidget, dump_state: DumpStateFunction, restore_state: RestoreStateFunction):
         name = widget.objectName()
         assert name
         title = widget.windowTitle() or name
@@ -139,13 +241,16 @@ class Window(QMainWindow):
             dock_widget.setObjectName(f"{name}__docked")
             dock_widget.setWidget(widget)
             self.addDockWidget(Qt.RightDockWidgetArea, dock_widget)
+            dock_widget.dockLocationChanged.connect(self.mark_dirty)
+            dock_widget.topLevelChanged.connect(self.mark_dirty)
+            dock_widget.visibilityChanged.connect(self.mark_dirty)
         else:
             dock_widget = widget_instance.dock_widget
             dock_widget.setWindowTitle(title)
             dock_widget.setWidget(widget)
             dock_widget.show()
-            if widget_instance.widget:
-                widget_instance.widget.close()
+            if widget_instance.widget and widget_instance.widget is not widget:
+                self._discard(widget_instance.widget)
             self.remove_menu.removeAction(widget_instance.remove_action)
 
         widget.setParent(dock_widget)
@@ -176,18 +281,139 @@ class Window(QMainWindow):
 
         widget.objectNameChanged.connect(forbid_name_change)
 
+        # widgets may announce changes of their state (see `MplFigure.state_changed`)
+        state_changed = getattr(widget, 'state_changed', None)
+        if state_changed is not None:
+            state_changed.connect(lambda *args: self.mark_widget_dirty(name))
+
         self.restore(widget)
+        self.performance_action.setChecked(PERFORMANCE_DOCK_NAME in self.widgets)
+        self.mark_widget_dirty(name)
+
+    def replace(
+        self,
+        widget: QWidget,
+        dump_state: DumpStateFunction = lambda: dict(),
+        restore_state: RestoreStateFunction = _ignore_state,
+    ):
+        """
+        Like `add`, but a widget replacing one of the same name takes over its current state (e.g. the view of a figure
+        that was drawn again) and the old widget is deleted.
+        """
+        name = widget.objectName()
+        old = self.widgets.get(name)
+        if old is not None:
+            try:
+                state = old.dump_state()
+            except Exception:
+                logging.exception(f"exception during serialization of '{name}'; the saved state is used")
+            else:
+                if not isinstance(self.loaded_widgets_state, MutableMapping):
+                    # states of a lazily decoded layout are read-only
+                    self.loaded_widgets_state = ChainMap({}, self.loaded_widgets_state)
+                self.loaded_widgets_state[name] = old.title, state
+        self.add(widget, dump_state, restore_state)
+
+    @staticmethod
+    def _discard(widget: QWidget):
+        # a widget may free what it holds first (see `MplFigure.release`), since it is deleted only later
+        release = getattr(widget, 'release', None)
+        if release is not None:
+            try:
+                release()
+            except Exception:
+                logging.exception(f"exception during releasing '{widget.objectName()}'")
+        widget.close()
+        widget.deleteLater()
+
+    def add_lazy(self, name: str, builder: WidgetBuilder, title: str = None, executor: Executor = None):
+        """
+        Adds a dock whose widget is created only when the dock is shown for the first time.
+
+        Until then the dock holds a placeholder (and keeps the restored geometry and state of the widget).
+        :param name: Name of the widget (as given by `objectName` of widgets added by `add`).
+        :param builder: A function that returns a `matplotlib.figure.Figure` (shown as a `MplFigure`) or a widget.
+        :param title: Title of the dock; by default the saved one or `name`.
+        :param executor: If given, `builder` is called there (e.g. in a thread pool) and must not create Qt objects.
+        """
+        saved_entry = self.loaded_widgets_state.get(name)
+        if title is None:
+            title = saved_entry[0] if saved_entry is not None else name
+
+        def dump_saved_state():
+            # the widget does not exist yet, so its state is the one that was restored
+            entry = self.loaded_widgets_state.get(name)
+            return entry[1] if entry is not None else dict()
+
+        self.add(named(QWidget(), name, title), dump_state=dump_saved_state)
+        dock_widget = self.widgets[name].dock_widget
+
+        def visibility_changed(visible):
+            if visible:
+                self._build_lazy(name)
+
+        self._lazy_builders[name] = builder, executor, visibility_changed
+        dock_widget.visibilityChanged.connect(visibility_changed)
+        # the dock may be shown already (then the signal doesn't come); a dock in a hidden tab has an empty region
+        QTimer.singleShot(0, lambda: dock_widget.visibleRegion().isEmpty() or self._build_lazy(name))
+
+    def _build_lazy(self, name):
+        builder, executor, visibility_changed = self._lazy_builders.pop(name, (None, None, None))
+        if builder is None:
+            return
+        self.widgets[name].dock_widget.visibilityChanged.disconnect(visibility_changed)
+        if executor is None:
+            try:
+                self._attach_lazy(name, builder())
+            except Exception:
+                logging.exception(f"exception during building '{name}'")
+        else:
+            future = executor.submit(builder)
+            future.add_done_callback(lambda f: self._lazy_widget_built.emit(name, f))
+
+    def _on_lazy_widget_built(self, name: str, future: Future):
+        try:
+            self._attach_lazy(name, future.result())
+        except Exception:
+            logging.exception(f"exception during building '{name}'")
+
+    def _attach_lazy(self, name: str, built: Union[QWidget, 'Figure']):
+        wi = self.widgets.get(name)
+        if wi is None:
+            return  # removed in the meantime
+        if isinstance(built, QWidget):
+            widget = named(built, name, wi.title)
+            self.add(widget, getattr(widget, 'dump_state', dict), getattr(widget, 'restore_state', _ignore_state))
+            return
+
+        from .backend import FigureCanvas
+        from .figure import MplFigure
+
+        widget = named(MplFigure(FigureCanvas(built)), name, wi.title)
+        self.add(widget, widget.dump_state, widget.restore_state)
+        widget.track_dock_visibility()
 
     def restore(self, widget: QWidget):
         name = widget.objectName()
         try:
-            title, state = self.loaded_widgets_state.get(name, (None, None))
+            widget_entry = self.loaded_widgets_state.get(name)
             widget_instance = self.widgets[name]
-            if state is not None:
-                widget_instance.restore_state(state)
+            if widget_entry is not None and widget_instance.restore_state is not _ignore_state:
+                state = widget_entry[1]
+                if state is not None:
+                    with perf.measure('restore_state', name):
+                        widget_instance.restore_state(state)
         except Exception as e:
             logging.exception(f"exception during restoring state of '{name}")
 
-    def run(self):
+    def run(self, main: Awaitable = None):
+        """
+        Runs the Qt event loop (until the application quits).
+        :param main: A coroutine to run meanwhile; it's run in an asyncio loop driven by Qt (see `mpldock.aio`).
+        """
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if main is not None:
+            from .aio import spawn
+
+            spawn(main)
         return QApplication.exec()
@@ -1,23 +1,32 @@
 import os
-from typing import Union
-
-from PyQt5.QtWidgets import QApplication, QWidget
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Awaitable, Union
 
 from mpldock.common import DumpStateFunction, RestoreStateFunction
 from .statemanager import StateManager
-from .window import Window
 
-WindowSpec = Union[str, Window, None]
-WidgetSpec = Union[str, QWidget, None]
+# Qt is imported when the first window is created, so `import mpldock` (and `persist_layout`) stays cheap
+if TYPE_CHECKING:
+    from PyQt5.QtWidgets import QWidget
+    from .scheduler import FrameScheduler
+    from .window import Window, WidgetBuilder
+
+WindowSpec = Union[str, 'Window', None]
+WidgetSpec = Union[str, 'QWidget', None]
 
 current_main_window = None  # type: Window
 windows_by_title = dict()
 
 qapplication = None
 state_manager = None
+builder_executor = None
+frame_scheduler = None  # type: FrameScheduler
 
 
 def _create_window(title, name, close_callback):
+    from PyQt5.QtWidgets import QApplication
+    from .window import Window
+
     global qapplication
     qapplication = qapplication or QApplication.instance() or QApplication([])  # just ensure application exist
     window = Window(parent=None, title=title, name=name, state_manager=obtain_state_manager())
@@ -26,12 +35,14 @@ def _create_window(title, name, close_callback):
     return window
 
 
-def _obtain_window(window_spec: WindowSpec = None) -> Window:
+def _obtain_window(window_spec: WindowSpec = None) -> 'Window':
     """
     Returns window with given name. Create it if doesn't exist. If `name` is `None`, return last window used.
     :param title:
     :return:
     """
+    from .window import Window
+
     global current_main_window
     if isinstance(window_spec, Window):
         current_main_window = window_spec
@@ -62,7 +73,7 @@ def _obtain_window(window_spec: WindowSpec = None) -> Window:
     return window
 
 
-def add_dock(widget: QWidget, dump_state: DumpStateFunction, restore_state: RestoreStateFunction,
+def add_dock(widget: 'QWidget', dump_state: DumpStateFunction, restore_state: RestoreStateFunction,
              window: WindowSpec = None):
     """
     Adds a widget to a current window (if given) or to a current one (if None).
@@ -75,7 +86,24 @@ def add_dock(widget: QWidget, dump_state: DumpStateFunction, restore_state: Rest
     window.add(widget, dump_state, restore_state)
 
 
-def window(title: str = None) -> Window:
+def add_lazy_dock(name: str, builder: 'WidgetBuilder', title: str = None, window: WindowSpec = None,
+                  threaded=False):
+    """
+    Adds a dock whose content is built only when the dock is shown for the first time (e.g. a figure in a background
+    tab). The dock takes its place in the restored layout right away.
+    :param name: A name identifying the widget (in the saved layout).
+    :param builder: A function returning a `matplotlib.figure.Figure` (made by `Figure()`, not pyplot) or a widget.
+    :param title: A dock title (the saved one or `name` by default).
+    :param window:
+    :param threaded: Call `builder` in a thread pool (then it must return a figure; Qt objects can't be created there).
+    """
+    global builder_executor
+    if threaded and builder_executor is None:
+        builder_executor = ThreadPoolExecutor(thread_name_prefix='mpldock-builder')
+    _obtain_window(window).add_lazy(name, builder, title, builder_executor if threaded else None)
+
+
+def window(title: str = None) -> 'Window':
     """
     Returns a window with given title. Creates if not existing. Sets it as a current window.
     :param title: A window title.
@@ -85,9 +113,13 @@ def window(title: str = None) -> Window:
     return _obtain_window(title)
 
 
-def run():
+def run(main: Awaitable = None):
+    """
+    Runs the Qt event loop.
+    :param main: A coroutine to run meanwhile, e.g. one awaiting data and updating figures (see `mpldock.aio`).
+    """
     # FIXME: there should be one common window manager with "run" (it should also be owner of _create_window method)
-    return window().run()
+    return window().run(main)
 
 
 def obtain_state_manager():
@@ -98,18 +130,36 @@ def obtain_state_manager():
     return state_manager
 
 
-def persist_layout(id: str, factory_default_path=None, load_now=True):
+def obtain_frame_scheduler() -> 'FrameScheduler':
+    """
+    Returns the scheduler that renders figures of all windows (set its `max_fps` and `frame_budget` to tune it).
+    """
+    from .scheduler import FrameScheduler
+
+    global frame_scheduler
+    if frame_scheduler is None:
+        frame_scheduler = FrameScheduler()
+    return frame_scheduler
+
+
+def persist_layout(id: str, factory_default_path=None, load_now=True, autosave_interval=None, state_format='json'):
     """
     Call this function before creating any other window to restore the layout on each run.
     :param id: Any string that is unique to the application.
     :param factory_default_path: A path to a file that stores factory default settings. Usually, it is a file that you
      want to ship along with your application. It is used if there is no locally saved layout.
     :param load_now: Load state immediately.
+    :param autosave_interval: If given, changes are saved in the background every that many seconds (not only when the
+     window is closed).
+    :param state_format: 'json' or 'mpldock' (indexed, decoded lazily; better for layouts with many figures). A layout
+     saved as json is still read after switching to 'mpldock'.
     :return:
     """
     global state_manager
     assert state_manager is None, "'persist_state' must be called before creating any window"
-    state_manager = StateManager(id, factory_default_path)
+    state_manager = StateManager(id, factory_default_path, state_format)
+    if id and autosave_interval:
+        state_manager.enable_autosave(autosave_interval)
     if id and load_now:
         success = state_manager.restore_from_system(id)
         if not success and factory_default_path and os.path.exists(factory_default_path):
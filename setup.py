@@ -26,14 +26,15 @@ setup(
         'pyqtgraph': ['pyqtgraph'],
     },
     packages=['mpldock'],
+    entry_points={
+        'console_scripts': ['mpldock-export=mpldock.export:main', 'mpldock-server=mpldock.server:main'],
+    },
     keywords=[
         'matplotlib', 'qt5', 'backend', 'dock', 'docking', 'dockable', 'layout'
     ],
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 3.6",
-        "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
         "Programming Language :: Python :: 3.10",
@@ -43,5 +44,5 @@ setup(
         "Topic :: Software Development",
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
-    python_requires='>=3.6'
+    python_requires='>=3.8'
 )
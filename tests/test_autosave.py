@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import pyqtSignal  # noqa: E402
+from PyQt5.QtWidgets import QApplication, QWidget  # noqa: E402
+
+from mpldock.common import named  # noqa: E402
+from mpldock.statemanager import StateManager  # noqa: E402
+from mpldock.window import Window  # noqa: E402
+
+
+class Counter(QWidget):
+    state_changed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.value = 0
+        self.dumps = 0
+
+    def change(self):
+        self.value += 1
+        self.state_changed.emit()
+
+    def dump_state(self):
+        self.dumps += 1
+        return dict(value=self.value)
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def autosave(state_manager, path):
+    state_manager.autosave()
+    state_manager._wait_for_autosave()
+    with open(path) as f:
+        return json.load(f)['clients']['main']['widgets']
+
+
+def test_autosave_dumps_only_changed_widgets(app, tmp_path):
+    path = str(tmp_path / 'state.json')
+    state_manager = StateManager(None, None)
+    state_manager.enable_autosave(interval=3600, path=path)
+    window = Window(None, "main", "main", state_manager)
+    counters = [named(Counter(), f"counter{i}") for i in range(3)]
+    for counter in counters:
+        window.add(counter, counter.dump_state)
+    plain = named(QWidget(), "plain")  # announces no changes, so it's always dumped
+    plain_dumps = []
+    window.add(plain, lambda: plain_dumps.append(1) or {})
+
+    autosave(state_manager, path)
+    assert [counter.dumps for counter in counters] == [1, 1, 1]
+
+    counters[1].change()
+    widgets = autosave(state_manager, path)
+    assert [counter.dumps for counter in counters] == [1, 2, 1]
+    assert len(plain_dumps) == 2
+    assert [widgets[f"counter{i}"][1]['value'] for i in range(3)] == [0, 1, 0]
+
+    window.remove_widget("counter0")
+    widgets = autosave(state_manager, path)
+    assert "counter0" not in widgets and [counter.dumps for counter in counters[1:]] == [2, 1]
+
+    state_manager.save_to_file(path)
+    assert [counter.dumps for counter in counters[1:]] == [3, 2]
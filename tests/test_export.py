@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+from matplotlib.image import imread
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES = os.path.join(ROOT, 'examples')
+
+
+def export(*args, cwd):
+    # in a separate process, like the command line, so figures of the script don't stay in pyplot of the tests
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    env.pop('QT_QPA_PLATFORM', None)  # the export must not need a display
+    env.pop('DISPLAY', None)
+    return subprocess.run([sys.executable, '-m', 'mpldock.export', *args], cwd=cwd, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True, timeout=300)
+
+
+def test_export_of_example(tmp_path):
+    result = export('--state', os.path.join(EXAMPLES, 'me_layout.json'), '--output', 'out', '--workers', '1',
+                    os.path.join(EXAMPLES, 'motivating_example.py'), cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    written = result.stdout.split()
+    assert sorted(written) == [os.path.join('out', f"MplFigure__{num}.png") for num in range(1, 10)]
+    image = imread(str(tmp_path / written[0]))
+    assert image.shape[0] > 100 and image.shape[1] > 100
+
+
+def test_failed_export(tmp_path):
+    result = export('--state', os.path.join(EXAMPLES, 'me_layout.json'), '--output', 'out', '--workers', '1',
+                    '--format', 'no-such-format', os.path.join(EXAMPLES, 'motivating_example.py'), cwd=tmp_path)
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert "cannot export MplFigure__1" in result.stderr
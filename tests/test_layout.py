@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QWidget  # noqa: E402
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from mpldock.layout import LAYOUT_PAD, SUBPLOT_PARAMS, FigureLayout  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def tight_params(figure):
+    figure.tight_layout(pad=LAYOUT_PAD)
+    return {name: getattr(figure.subplotpars, name) for name in SUBPLOT_PARAMS}
+
+
+def test_cached_layout_follows_tick_labels(app):
+    figure = Figure(figsize=(4, 3))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    ax.plot([0, 1], [0, 1])
+    layout = FigureLayout(figure, QWidget())
+    layout.apply()
+    narrow = layout._current_params()
+
+    # wider y tick labels need a wider left margin
+    ax.set_ylim(0, 50000)
+    layout.apply()
+    assert layout._current_params() == pytest.approx(tight_params(figure))
+    assert layout._current_params()['left'] > narrow['left']
+
+    ax.set_ylim(0, 1)
+    layout.apply()
+    assert layout._current_params() == pytest.approx(tight_params(figure))
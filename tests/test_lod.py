@@ -0,0 +1,79 @@
+import matplotlib
+import numpy as np
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from mpldock.lod import LodLine
+
+matplotlib.use('agg')
+
+# share of the pixels along the line whose coverage may differ from the full-resolution render
+EDGE_TOLERANCE = 0.1
+
+
+def random_walk(n, uniform, seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.arange(n, dtype=float) if uniform else np.sort(rng.random(n) ** 2) * n
+    return x, np.cumsum(rng.standard_normal(n))
+
+
+def plot(x, y, lod, xlim=None):
+    figure = Figure(figsize=(6, 4), dpi=100)
+    FigureCanvasAgg(figure)
+    ax = figure.add_axes([0.1, 0.1, 0.8, 0.8])
+    line, = ax.plot(x, y, lw=1)
+    ax.set_xlim(*(xlim or (x[0], x[-1])))
+    ax.set_ylim(y.min() - 1, y.max() + 1)
+    return ax, line, LodLine(line) if lod else None
+
+
+def drawn_pixels(ax):
+    ax.figure.canvas.draw()
+    return np.any(np.asarray(ax.figure.canvas.buffer_rgba())[..., :3] < 128, axis=2)
+
+
+def dilated(mask):
+    padded = np.pad(mask, 1)
+    return np.any([padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+                   for dy in (-1, 0, 1) for dx in (-1, 0, 1)], axis=0)
+
+
+@pytest.mark.parametrize('uniform', [True, False])
+@pytest.mark.parametrize('view', ['all', 'part', 'inverted'])
+def test_bins_keep_exact_extremes(uniform, view):
+    x, y = random_walk(300_001, uniform)
+    xlim = dict(all=(x[0], x[-1]), part=(x[1000], x[200_000]), inverted=(x[-1], x[0]))[view]
+    ax, line, lod = plot(x, y, lod=True, xlim=xlim)
+    assert lod.decimated
+
+    starts, stops = lod._bin_ranges(ax)
+    filled = stops > starts
+    starts, stops = starts[filled], stops[filled]
+    imin, imax = lod._range_extremes(starts, stops)
+    for start, stop, i, j in zip(starts, stops, imin, imax):
+        assert start <= i < stop and start <= j < stop
+        assert y[i] == y[start:stop].min() and y[j] == y[start:stop].max()
+
+
+@pytest.mark.parametrize('n, uniform', [(2 ** 20, True), (2 ** 18, True), (2 ** 20, False), (2 ** 16, False)])
+def test_render_matches_full_resolution_up_to_edges(n, uniform):
+    x, y = random_walk(n, uniform, seed=1)
+    full = drawn_pixels(plot(x, y, lod=False)[0])
+    ax, line, lod = plot(x, y, lod=True)
+    decimated = drawn_pixels(ax)
+
+    assert len(line.get_xdata()) < n / 4
+    # pixels differ only along the line (antialiasing), never further than a pixel from the full line
+    assert not np.any(decimated & ~dilated(full))
+    assert not np.any(full & ~dilated(decimated))
+    assert np.sum(full ^ decimated) < EDGE_TOLERANCE * np.sum(full)
+
+
+def test_shows_full_resolution_when_zoomed_in():
+    x, y = random_walk(100_000, uniform=False)
+    ax, line, lod = plot(x, y, lod=True, xlim=(x[500], x[700]))
+    assert not lod.decimated
+    shown = line.get_xdata()
+    assert shown[0] <= x[500] and shown[-1] >= x[700]
+    assert np.all(np.diff(shown) > 0)
@@ -0,0 +1,29 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from mpldock import producers  # noqa: E402
+
+
+@pytest.fixture
+def shared_pool(monkeypatch):
+    monkeypatch.setattr(producers, '_executor', None)
+    monkeypatch.setattr(producers, '_executor_size', 0)
+    monkeypatch.setattr(producers, '_executor_load', 0)
+    monkeypatch.setattr(producers.os, 'cpu_count', lambda: 2)
+    pools = []
+    yield pools
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_shared_pool_grows_instead_of_queueing_producers(shared_pool):
+    shared_pool += [producers._obtain_executor() for _ in range(3)]
+    assert shared_pool[0] is shared_pool[1]
+    assert shared_pool[2] is not shared_pool[1]  # both processes of the first pool are taken
+    assert producers._executor_size == 4 and producers._executor_load == 1
+
+    shared_pool += [producers._obtain_executor() for _ in range(3)]
+    assert len(set(map(id, shared_pool))) == 2
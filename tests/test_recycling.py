@@ -0,0 +1,129 @@
+import gc
+import os
+import sys
+import time
+import weakref
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import sip  # noqa: E402
+from PyQt5.QtCore import QEvent, QObject  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+RECREATIONS = 30
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def plt(app):
+    import matplotlib.pyplot as plt
+
+    backend = plt.get_backend()
+    plt.switch_backend('module://mpldock')
+    yield plt
+    plt.close('all')
+    plt.switch_backend(backend)
+
+
+@pytest.fixture
+def window(app, plt, request):
+    from mpldock import windows
+
+    win = windows.window(request.node.name)
+    win.show()
+    yield win
+    if not sip.isdeleted(win):
+        win.close()
+    windows.windows_by_title.pop(request.node.name, None)
+    windows.current_main_window = None
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    # exceptions in slots are passed to `sys.excepthook` instead of being raised
+    errors = []
+    monkeypatch.setattr(sys, 'excepthook', lambda *exc_info: errors.append(exc_info))
+    return errors
+
+
+def process_events(app, seconds=0.1):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
+        time.sleep(0.005)
+
+
+def canvases():
+    from mpldock.backend import FigureCanvas
+
+    gc.collect()
+    return [obj for obj in gc.get_objects() if isinstance(obj, FigureCanvas) and not sip.isdeleted(obj)]
+
+
+def test_recreated_figure_reuses_dock_and_frees_closed_ones(app, plt, window, errors):
+    from mpldock.buffers import obtain_buffer_budget
+
+    plt.figure(1).add_subplot().plot([1, 3, 2])
+    process_events(app)
+    widget = window.widgets['MplFigure__1'].widget
+    canvas = widget.canvas
+    docks, children, alive = len(window.widgets), len(widget.findChildren(QObject)), len(canvases())
+    tracked = len(obtain_buffer_budget()._alive())
+
+    closed = []
+    for i in range(RECREATIONS):
+        figure = plt.figure(1)
+        closed.append((weakref.ref(figure), weakref.ref(figure.canvas.manager)))
+        plt.close(figure)
+        del figure
+        plt.figure(1).add_subplot().plot([i, 1, 2])
+        process_events(app, 0.02)
+    process_events(app)
+
+    assert window.widgets['MplFigure__1'].widget is widget and widget.canvas is canvas
+    assert plt.figure(1).canvas is canvas
+    assert len(window.widgets) == docks
+    assert len(widget.findChildren(QObject)) == children  # e.g. toolbars of closed figures are deleted
+    assert len(canvases()) == alive
+    assert len(obtain_buffer_budget()._alive()) == tracked
+    assert all(figure() is None and manager() is None for figure, manager in closed)
+    assert not errors
+
+
+def test_removed_dock_frees_canvas(app, plt, window, errors):
+    from mpldock.buffers import obtain_buffer_budget
+
+    alive, tracked = len(canvases()), len(obtain_buffer_budget()._alive())
+    for num in range(1, 4):
+        plt.figure(num).add_subplot().plot([1, 3, 2])
+    process_events(app)
+    assert len(canvases()) == alive + 3
+
+    for num in range(1, 4):
+        window.remove_widget(f"MplFigure__{num}")
+    process_events(app)
+    assert plt.get_fignums() == []
+    assert len(canvases()) == alive
+    assert len(obtain_buffer_budget()._alive()) == tracked
+    assert not errors
+
+
+def test_deleted_window_closes_figures(app, plt, window, errors):
+    for num in range(1, 4):
+        plt.figure(num).add_subplot().plot([1, 3, 2])
+    plt.close(1)
+    plt.figure(1)  # reuses the dock
+    process_events(app)
+
+    # what happens to the window when the application exits
+    sip.delete(window)
+    process_events(app)
+    assert plt.get_fignums() == []
+    assert not errors
@@ -0,0 +1,85 @@
+import os
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from mpldock.statemanager import StateManager  # noqa: E402
+from mpldock.window import Window  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def window(app):
+    window = Window(None, "main", "main", StateManager(None, None))
+    window.show()
+    yield window
+    window.close()
+
+
+def process_events(app, until, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    assert until()
+
+
+def dumped_xlim(window, name):
+    return list(window.dump_changed_state()['widgets'][name][1]['axes'][0]['xlim'])
+
+
+def built_figure():
+    figure = Figure()
+    figure.add_subplot().plot([0, 1])
+    return figure
+
+
+def test_view_of_lazily_built_figure_is_saved(app, window):
+    window.add_lazy("lazy", built_figure)
+    process_events(app, lambda: hasattr(window.widgets["lazy"].widget, 'figure'))
+    ax = window.widgets["lazy"].widget.figure.axes[0]
+    assert ax.get_adjustable() == 'datalim'  # tweaked like axes created in a dock
+    dumped_xlim(window, "lazy")
+
+    ax.set_xlim(0.25, 0.5)
+    assert "lazy" in window._dirty_widgets
+    assert dumped_xlim(window, "lazy") == [0.25, 0.5]
+
+
+def test_saved_view_is_restored_to_lazily_built_figure(app, window):
+    window.add_lazy("saved", built_figure)
+    process_events(app, lambda: hasattr(window.widgets["saved"].widget, 'figure'))
+    ax = window.widgets["saved"].widget.figure.axes[0]
+    ax.set_xlim(0.25, 0.5)
+    state = window.dump_state()
+
+    window.widgets["saved"].widget.restore_state(dict(axes=[]))
+    ax.set_xlim(0, 1)
+    window.restore_state(state)
+    assert ax.get_xlim() == (0.25, 0.5)
+
+
+def test_view_of_figure_sent_to_server_is_saved(app, window):
+    from mpldock import windows
+    from mpldock.server import Server
+
+    windows._obtain_window(window)
+    try:
+        Server.show_figure("sent", built_figure(), "sent")
+    finally:
+        windows.current_main_window = None
+    ax = window.widgets["sent"].widget.figure.axes[0]
+    assert ax.get_adjustable() == 'datalim'
+
+    ax.set_xlim(0.25, 0.5)
+    assert "sent" in window._dirty_widgets
+    assert dumped_xlim(window, "sent") == [0.25, 0.5]